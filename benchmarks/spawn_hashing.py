@@ -0,0 +1,79 @@
+#Checks that local files are hashed by processes (gd push -u -j <N>) with the 'spawn' start method,
+#which is the default on Windows and macOS. Spawned processes import the main module again as
+#'__mp_main__', so gd.py must be importable that way.
+#
+#Usage : python benchmarks/spawn_hashing.py
+#
+#The script exits with status 1 if a check fails.
+
+import os
+import sys
+import hashlib
+import tempfile
+import subprocess
+import multiprocessing
+
+GD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gdrive2')
+GD_PATH = os.path.join(GD_DIR, 'gd.py')
+
+#gd.py is run as a script from its folder, so its modules are imported as top-level modules
+sys.path.insert(0, GD_DIR)
+
+
+def import_as_spawned():
+    """
+    Imports gd.py as '__mp_main__' in a new python process, as spawned processes do.
+    Returns the error output (empty if imported).
+    """
+    code = "import sys, runpy; sys.path.insert(0, {!r}); runpy.run_path({!r}, run_name='__mp_main__')".format(GD_DIR, GD_PATH)
+
+    with tempfile.TemporaryDirectory() as folder:
+        result = subprocess.run([sys.executable, '-c', code], cwd=folder, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+
+    return result.stderr.strip()
+
+
+def hash_with_spawn(jobs=2, files=2):
+    """
+    Hashes files with get_md5_many() using spawned processes.
+    Returns True if the checksums are correct.
+    """
+    from hash_util import get_md5_many, HASH_BATCH_SIZE
+
+    with tempfile.TemporaryDirectory() as folder:
+        file_paths = []
+        md5s = {}
+
+        for i in range(files):
+            file_path = os.path.join(folder, str(i))
+            #one batch per file, so that all the files are hashed by the processes
+            data = os.urandom(1024) * (HASH_BATCH_SIZE // 1024)
+
+            with open(file_path, 'wb') as file:
+                file.write(data)
+
+            file_paths.append(file_path)
+            md5s[file_path] = hashlib.md5(data).hexdigest()
+
+        return get_md5_many(file_paths, jobs=jobs) == md5s
+
+
+if __name__ == '__main__':
+
+    multiprocessing.set_start_method('spawn')
+    failed = False
+
+    error = import_as_spawned()
+    if error != '':
+        print("gd.py can't be imported by spawned processes :\n" + error)
+        failed = True
+
+    if not hash_with_spawn():
+        print("md5 checksums by spawned processes don't match")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+    print("hashing with spawned processes : ok")
@@ -0,0 +1,55 @@
+#Measures the time taken by gd commands which don't need drive, like 'gd help'.
+#
+#Usage : python benchmarks/startup.py [<runs>] [<command> <args> ...]
+#
+#Each run starts a new python process, as the gd command does. The script exits
+#with status 1 if the median time is more than MAX_STARTUP_TIME seconds.
+
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+
+#Maximum median time (in s) of a command
+MAX_STARTUP_TIME = 0.1
+
+GD_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gdrive2', 'gd.py')
+
+
+def time_command(command, runs=20):
+    """
+    Runs 'python gd.py <command>' runs times in an empty folder and returns the times taken (in s)
+    """
+    times = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            subprocess.run([sys.executable, GD_PATH] + command, cwd=folder,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start_time)
+
+    return times
+
+
+if __name__ == '__main__':
+
+    runs = 20
+    command = ['help']
+
+    if len(sys.argv) > 1:
+        runs = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        command = sys.argv[2:]
+
+    times = time_command(command, runs=runs)
+    median_time = statistics.median(times)
+
+    print("gd {} : median {} ms, min {} ms ({} runs)".format(' '.join(command), round(median_time*1000, 1),
+                                                            round(min(times)*1000, 1), runs))
+
+    if median_time > MAX_STARTUP_TIME:
+        print("Slower than {} ms".format(MAX_STARTUP_TIME*1000))
+        sys.exit(1)
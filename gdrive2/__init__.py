@@ -1,5 +1,5 @@
 from .gd import *
 
 ROOT_PATH = os.path.dirname(__file__)
-if not 'gd' in os.listdir(ROOT_PATH):
+if not os.path.exists(os.path.join(ROOT_PATH, 'gd')):
 	shutil.copyfile(os.path.join(ROOT_PATH, 'gd.py'), os.path.join(ROOT_PATH, 'gd'))
\ No newline at end of file
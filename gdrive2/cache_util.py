@@ -0,0 +1,633 @@
+#This file contains functions relevant to caching drive metadata
+#in the .gd folder of the current directory
+
+import os
+import json
+import time
+import atexit
+import threading
+
+#paths.py contains all the cache path information
+if __name__ == 'cache_util':
+    from paths import *
+else:
+    from .paths import *
+
+#Folder where the cache files are saved (None keeps the cache in memory only)
+CACHE_DIR = None
+#username whose drive metadata is being cached
+CACHE_USER = 'no_user'
+
+#In-memory copies of the cache files : {(cache_dir, user_name, drive_id) : cache dict}.
+#The cache folder is part of the key, since the gd daemon runs commands from different folders
+_CACHES = {}
+#Keys of the caches modified since they were last saved
+_DIRTY = set()
+#Lock for the cache updates made by concurrent uploads
+_LOCK = threading.RLock()
+
+
+def set_cache_dir(cache_dir):
+    """
+    Sets the folder where cache files are saved.
+
+    Parameters
+    -------------
+    cache_dir : string or None
+        path to the cache folder. The folder is created when the cache is first saved,
+        provided its parent folder (.gd) exists. None keeps the cache in memory only.
+
+    Returns
+    -------------
+    None
+    """
+    global CACHE_DIR
+    CACHE_DIR = cache_dir
+
+
+def set_cache_user(user_name):
+    """
+    Sets the username whose drive metadata is cached.
+    Ids like 'root' are the same for all accounts, so caches are kept separately for each username.
+
+    Parameters
+    -------------
+    user_name : string
+
+    Returns
+    -------------
+    None
+    """
+    global CACHE_USER
+    if user_name==None:
+        user_name = 'no_user'
+    CACHE_USER = user_name
+
+
+def cache_file_path(drive_id, user_name=None, cache_dir=None):
+    """
+    Returns the path to the cache file of a drive for a username
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    user_name : string (optional)
+        If None, the current CACHE_USER is used.
+    cache_dir : string (optional)
+        If None, the current CACHE_DIR is used.
+
+    Returns
+    -------------
+    path to the cache file : string or None
+        None if no CACHE_DIR is set
+    """
+    if cache_dir==None:
+        cache_dir = CACHE_DIR
+
+    if cache_dir==None:
+        return None
+
+    if user_name==None:
+        user_name = CACHE_USER
+
+    return os.path.join(cache_dir, user_name + '_' + drive_id + '.json')
+
+
+def load_cache(drive_id):
+    """
+    Returns the cache dictionary of a drive for the current username.
+    The cache file is read only the first time, after which the in-memory copy is used.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+
+    Returns
+    -------------
+    cache : dict
+        {'children' : {parent_id : {name : [ids list, mimeTypes list, time cached]}},
+        'ancestors' : {file_id : [title, parent_id, time cached]},
+        'roots' : {root alias : [root folder id, time cached]}}
+    """
+    key = (CACHE_DIR, CACHE_USER, drive_id)
+
+    if not key in _CACHES:
+        cache = {}
+        cache_path = cache_file_path(drive_id)
+
+        if cache_path!=None and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as file:
+                    cache = json.load(file)
+            except:
+                #corrupt cache files are discarded
+                cache = {}
+
+        cache.setdefault('children', {})
+        cache.setdefault('ancestors', {})
+        cache.setdefault('roots', {})
+        _CACHES[key] = cache
+
+    return _CACHES[key]
+
+
+def save_caches():
+    """
+    Writes the modified in-memory caches into their cache files.
+    This is called automatically when python exits.
+
+    Returns
+    -------------
+    None
+    """
+    for key in list(_DIRTY):
+        cache_dir, user_name, drive_id = key
+
+        #caches are saved only if the .gd folder of their cache folder exists
+        if cache_dir==None or not os.path.exists(os.path.dirname(cache_dir)):
+            continue
+
+        if not os.path.exists(cache_dir):
+            os.mkdir(cache_dir)
+
+        with open(cache_file_path(drive_id, user_name, cache_dir), 'w') as file:
+            json.dump(_CACHES[key], file)
+
+    _DIRTY.clear()
+
+atexit.register(save_caches)
+
+
+def _mark_dirty(drive_id):
+    """Marks the cache of a drive to be saved"""
+    _DIRTY.add((CACHE_DIR, CACHE_USER, drive_id))
+
+
+def get_cached_children(drive_id, parent_id, name):
+    """
+    Looks for the ids and mimeTypes of files/folders with title = name in the folder
+    with id = parent_id in the cache.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    parent_id : string
+        id of the parent folder
+    name : string
+        title of the file or folder
+
+    Returns
+    -------------
+    ids and mime types : tuple or None
+        (list of ids, list of mimeTypes) or None if not cached or if the entry is older than CACHE_TTL
+    """
+    entry = load_cache(drive_id)['children'].get(parent_id, {}).get(name)
+
+    if entry==None or time.time() - entry[2] > CACHE_TTL:
+        return None
+
+    return list(entry[0]), list(entry[1])
+
+
+def cache_children(drive_id, parent_id, name, ids_list, mimes_list):
+    """
+    Caches the ids and mimeTypes of files/folders with title = name in the folder
+    with id = parent_id. The title and parent of each id are also added to the ancestors.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    parent_id : string
+        id of the parent folder
+    name : string
+        title of the file or folder
+    ids_list : list
+        ids of all the files/folders with title = name
+    mimes_list : list
+        corresponding mimeTypes
+
+    Returns
+    -------------
+    None
+    """
+    cache = load_cache(drive_id)
+    cache_time = time.time()
+    cache['children'].setdefault(parent_id, {})[name] = [list(ids_list), list(mimes_list), cache_time]
+
+    for file_id in ids_list:
+        cache['ancestors'][file_id] = [name, parent_id, cache_time]
+
+    _mark_dirty(drive_id)
+
+
+def get_cached_ancestor(drive_id, file_id):
+    """
+    Looks for the title and parent id of a file/folder in the cache.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    file_id : string
+        id of the file or folder
+
+    Returns
+    -------------
+    title and parent id : tuple or None
+        (title, parent id) or None if not cached or if the entry is older than CACHE_TTL.
+        parent id is None if the file has no parents.
+    """
+    entry = load_cache(drive_id)['ancestors'].get(file_id)
+
+    if entry==None or time.time() - entry[2] > CACHE_TTL:
+        return None
+
+    return entry[0], entry[1]
+
+
+def cache_ancestor(drive_id, file_id, title, parent_id):
+    """
+    Caches the title and parent id of a file/folder.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    file_id : string
+        id of the file or folder
+    title : string
+        title of the file or folder
+    parent_id : string or None
+        id of its first parent (None if no parents)
+
+    Returns
+    -------------
+    None
+    """
+    load_cache(drive_id)['ancestors'][file_id] = [title, parent_id, time.time()]
+    _mark_dirty(drive_id)
+
+
+def get_cached_root(drive_id):
+    """
+    Looks for the actual id of the root folder of a drive in the cache.
+    (The root folder of 'My Drive' is called 'root', but has a different id)
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+
+    Returns
+    -------------
+    id of the root folder : string or None
+        None if not cached
+    """
+    entry = load_cache(drive_id)['roots'].get(drive_id)
+
+    if entry==None:
+        return None
+
+    return entry[0]
+
+
+def cache_root(drive_id, root_id):
+    """
+    Caches the actual id of the root folder of a drive.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    root_id : string
+        id of its root folder
+
+    Returns
+    -------------
+    None
+    """
+    load_cache(drive_id)['roots'][drive_id] = [root_id, time.time()]
+    _mark_dirty(drive_id)
+
+
+def add_cached_child(drive_id, parent_id, name, file_id, mime_type):
+    """
+    Adds a newly created file/folder to the cache.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    parent_id : string
+        id of the parent folder
+    name : string
+        title of the new file or folder
+    file_id : string
+        id of the new file or folder
+    mime_type : string
+        mimeType of the new file or folder
+
+    Returns
+    -------------
+    None
+    """
+    with _LOCK:
+        cached = get_cached_children(drive_id, parent_id, name)
+
+        if cached==None:
+            cached = ([], [])
+
+        if not file_id in cached[0]:
+            cached[0].append(file_id)
+            cached[1].append(mime_type)
+
+        cache_children(drive_id, parent_id, name, *cached)
+
+
+def uncache_id(drive_id, file_id):
+    """
+    Removes all the cache entries containing a file/folder id, along with
+    the cached contents and ancestry of the folder. Used when the file/folder is deleted.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    file_id : string
+        id of the deleted file or folder
+
+    Returns
+    -------------
+    None
+    """
+    cache = load_cache(drive_id)
+    cache['ancestors'].pop(file_id, None)
+    children = cache['children']
+    children.pop(file_id, None)
+
+    for parent_id in list(children):
+        for name in list(children[parent_id]):
+            entry = children[parent_id][name]
+            if file_id in entry[0]:
+                del children[parent_id][name]
+
+        if len(children[parent_id])==0:
+            del children[parent_id]
+
+    _mark_dirty(drive_id)
+
+
+def clear_cache(drive_id=None, user_name=None):
+    """
+    Clears the cache of the current CACHE_DIR from the memory and deletes its cache files.
+
+    Parameters
+    -------------
+    drive_id : string (optional)
+        id of the drive. If None, caches of all the drives are cleared.
+    user_name : string (optional)
+        If None, caches of all the usernames are cleared.
+
+    Returns
+    -------------
+    None
+    """
+    for key in list(_CACHES):
+        if key[0]==CACHE_DIR and (user_name==None or key[1]==user_name) and (drive_id==None or key[2]==drive_id):
+            del _CACHES[key]
+            _DIRTY.discard(key)
+
+    if CACHE_DIR==None or not os.path.exists(CACHE_DIR):
+        return
+
+    for file_name in os.listdir(CACHE_DIR):
+        if not file_name.endswith('.json'):
+            continue
+
+        #file names are <user_name>_<drive_id>.json. Usernames may have '_', while drive ids don't,
+        #so the name is split at the last '_' (a prefix match would clear user 'a_b' along with user 'a')
+        file_user, _, file_drive = file_name[:-len('.json')].rpartition('_')
+
+        if user_name!=None and file_user!=user_name:
+            continue
+        if drive_id!=None and file_drive!=drive_id:
+            continue
+
+        os.remove(os.path.join(CACHE_DIR, file_name))
+
+
+def sessions_file_path():
+    """
+    Returns the path to the file in which resumable upload sessions are saved.
+    It is kept in the .gd folder, next to the CACHE_DIR.
+
+    Returns
+    -------------
+    path to the sessions file : string or None
+        None if no CACHE_DIR is set or if the .gd folder doesn't exist
+    """
+    if CACHE_DIR==None or not os.path.exists(os.path.dirname(CACHE_DIR)):
+        return None
+
+    return os.path.join(os.path.dirname(CACHE_DIR), UPLOAD_SESSIONS)
+
+
+def upload_session_key(file_path, drive_folder_id, title, file_id=None):
+    """
+    Returns the key under which the upload session of a file is saved.
+
+    Parameters
+    -------------
+    file_path : string
+        path to the file on current system
+    drive_folder_id : string
+        id of the drive folder into which it is uploaded
+    title : string
+        title of the file on drive
+    file_id : string (optional)
+        id of the drive file being overwritten (None for new files)
+
+    Returns
+    -------------
+    key : string
+    """
+    return '|'.join([CACHE_USER, drive_folder_id, str(file_id), title, os.path.abspath(file_path)])
+
+
+def _load_sessions():
+    """Returns the dict of saved upload sessions"""
+    sessions_path = sessions_file_path()
+
+    if sessions_path==None or not os.path.exists(sessions_path):
+        return {}
+
+    try:
+        with open(sessions_path, 'r') as file:
+            return json.load(file)
+    except:
+        return {}
+
+
+def _save_sessions(sessions):
+    """Writes the dict of upload sessions into the sessions file"""
+    sessions_path = sessions_file_path()
+
+    if sessions_path==None:
+        return
+
+    with open(sessions_path, 'w') as file:
+        json.dump(sessions, file)
+
+
+def get_upload_session(key, file_path):
+    """
+    Looks for a saved upload session of a file.
+    Sessions are discarded if the file was modified after the session began.
+
+    Parameters
+    -------------
+    key : string
+        key returned by upload_session_key()
+    file_path : string
+        path to the file on current system
+
+    Returns
+    -------------
+    session uri : string or None
+        None if no session is saved, if it is older than UPLOAD_SESSION_TTL,
+        or if the file changed since
+    """
+    with _LOCK:
+        session = _load_sessions().get(key)
+
+    if session==None or time.time() - session['time'] > UPLOAD_SESSION_TTL:
+        return None
+
+    stat = os.stat(file_path)
+    if session['size']!=stat.st_size or session['mtime']!=stat.st_mtime:
+        return None
+
+    return session['uri']
+
+
+def save_upload_session(key, file_path, uri):
+    """
+    Saves the uri of a resumable upload session, so that the upload
+    can be resumed if it gets interrupted. It is written to the sessions file immediately.
+
+    Parameters
+    -------------
+    key : string
+        key returned by upload_session_key()
+    file_path : string
+        path to the file on current system
+    uri : string
+        resumable session uri
+
+    Returns
+    -------------
+    None
+    """
+    stat = os.stat(file_path)
+
+    with _LOCK:
+        sessions = _load_sessions()
+        sessions[key] = {'uri' : uri, 'size' : stat.st_size, 'mtime' : stat.st_mtime, 'time' : time.time()}
+        _save_sessions(sessions)
+
+
+def remove_upload_session(key):
+    """
+    Removes a saved upload session once the upload is complete or the session is invalid.
+
+    Parameters
+    -------------
+    key : string
+        key returned by upload_session_key()
+
+    Returns
+    -------------
+    None
+    """
+    with _LOCK:
+        sessions = _load_sessions()
+
+        if key in sessions:
+            del sessions[key]
+            _save_sessions(sessions)
+
+
+def manifest_file_path(name):
+    """
+    Returns the path to a manifest file. Manifests are kept in the MANIFEST_FOLDER of the .gd folder.
+
+    Parameters
+    -------------
+    name : string
+        name of the manifest
+
+    Returns
+    -------------
+    path to the manifest file : string or None
+        None if no CACHE_DIR is set or if the .gd folder doesn't exist
+    """
+    if CACHE_DIR==None or not os.path.exists(os.path.dirname(CACHE_DIR)):
+        return None
+
+    return os.path.join(os.path.dirname(CACHE_DIR), MANIFEST_FOLDER, name + '.json')
+
+
+def load_manifest(name):
+    """
+    Returns a saved manifest, like the one of the files synced by 'gd pull --sync'
+
+    Parameters
+    -------------
+    name : string
+        name of the manifest
+
+    Returns
+    -------------
+    manifest : dict
+        {local file path : entry}, empty if not saved before
+    """
+    manifest_path = manifest_file_path(name)
+
+    if manifest_path==None or not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, 'r') as file:
+            return json.load(file)
+    except:
+        return {}
+
+
+def save_manifest(name, manifest):
+    """
+    Saves a manifest into its manifest file.
+
+    Parameters
+    -------------
+    name : string
+        name of the manifest
+    manifest : dict
+
+    Returns
+    -------------
+    None
+    """
+    manifest_path = manifest_file_path(name)
+
+    if manifest_path==None:
+        return
+
+    if not os.path.exists(os.path.dirname(manifest_path)):
+        os.mkdir(os.path.dirname(manifest_path))
+
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file)
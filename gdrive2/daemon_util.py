@@ -0,0 +1,328 @@
+#This file contains functions relevant to the gd daemon, which runs gd commands
+#in a long-lived process, and to forwarding commands to it over a unix socket
+
+import os
+import sys
+import stat
+import json
+import socket
+import struct
+import threading
+import builtins
+import traceback
+
+#paths.py contains all the daemon path information
+if __name__ == 'daemon_util':
+    from paths import *
+else:
+    from .paths import *
+
+
+def daemon_supported():
+    """Checks if unix sockets and user ids, needed by the gd daemon, are available on this system"""
+    return hasattr(socket, 'AF_UNIX') and hasattr(os, 'getuid')
+
+
+def daemon_socket_path():
+    """
+    Returns the path to the unix socket of the gd daemon. Each system user has a separate daemon,
+    whose socket is in a folder only the user can access (see _socket_dir()).
+
+    Returns
+    -------------
+    path to the socket : string
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+
+    if runtime_dir:
+        socket_dir = os.path.join(runtime_dir, DAEMON_DIR)
+    else:
+        socket_dir = os.path.join(os.path.expanduser('~'), DAEMON_HOME_DIR)
+
+    return os.path.join(socket_dir, DAEMON_SOCKET)
+
+
+def _owned_by_user(path_stat):
+    """Checks if a file (os.lstat() result) belongs to the current system user"""
+    return path_stat.st_uid == os.getuid()
+
+
+def _socket_dir(create=False):
+    """
+    Returns the folder of the daemon's socket, if it is a folder (not a link) owned by the current user
+    and not accessible by other users (else None).
+
+    Parameters
+    -------------
+    create : bool (optional)
+        If True, the folder is created (with mode 0700) if missing
+    """
+    socket_dir = os.path.dirname(daemon_socket_path())
+
+    if create and not os.path.lexists(socket_dir):
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+
+    try:
+        dir_stat = os.lstat(socket_dir)
+    except FileNotFoundError:
+        return None
+
+    if not stat.S_ISDIR(dir_stat.st_mode) or not _owned_by_user(dir_stat) or dir_stat.st_mode & 0o077:
+        return None
+
+    return socket_dir
+
+
+def _peer_uid(connection):
+    """Returns the id of the system user at the other end of a unix socket connection (None if not known)"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid
+
+
+def _send(file, message):
+    """Writes a message (dict) as one line of json"""
+    file.write((json.dumps(message) + '\n').encode())
+    file.flush()
+
+
+def _receive(file):
+    """Reads a message (dict) written by _send() (None if the connection is closed)"""
+    line = file.readline()
+
+    if not line:
+        return None
+
+    return json.loads(line.decode())
+
+
+def _connect(timeout=None):
+    """
+    Returns a socket connected to the daemon (None if no daemon is running).
+    Sockets not in a private folder, or not owned by the current user, are never connected to.
+    """
+    if not daemon_supported() or _socket_dir()==None:
+        return None
+
+    socket_path = daemon_socket_path()
+
+    try:
+        socket_stat = os.lstat(socket_path)
+    except FileNotFoundError:
+        return None
+
+    if not stat.S_ISSOCK(socket_stat.st_mode) or not _owned_by_user(socket_stat):
+        return None
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+
+    #the process listening on the socket must belong to the current user too
+    if _peer_uid(connection) not in (None, os.getuid()):
+        connection.close()
+        return None
+
+    return connection
+
+
+def daemon_running():
+    """
+    Checks if the gd daemon is running.
+
+    Returns
+    -------------
+    running or not : bool
+    """
+    connection = _connect(timeout=DAEMON_TIMEOUT)
+
+    if connection==None:
+        return False
+
+    connection.close()
+    return True
+
+
+def forward_command(cwd, func, args):
+    """
+    Runs a gd command in the gd daemon, if it is running. The output of the command is printed
+    as it is sent by the daemon, and the inputs asked for by the command are read from this process.
+
+    Parameters
+    -------------
+    cwd : string
+        directory in which the command is run
+    func : string
+        name of the gd command, like 'push'
+    args : list
+        list of arguement strings of the command
+
+    Returns
+    -------------
+    exit status : int or None
+        None if the daemon isn't running (the command isn't run)
+    """
+    connection = _connect(timeout=DAEMON_TIMEOUT)
+
+    if connection==None:
+        return None
+
+    #commands can run as long as they need
+    connection.settimeout(None)
+
+    with connection, connection.makefile('rwb') as file:
+        _send(file, {'cwd' : cwd, 'func' : func, 'args' : args})
+
+        while True:
+            message = _receive(file)
+
+            if message==None:
+                print("gd daemon closed the connection.")
+                return 1
+
+            if 'out' in message:
+                print(message['out'], end='', flush=True)
+
+            elif 'input' in message:
+                _send(file, {'line' : input(message['input'])})
+
+            elif 'exit' in message:
+                return message['exit']
+
+
+def stop_daemon():
+    """
+    Stops the gd daemon after it finishes its current command.
+
+    Returns
+    -------------
+    stopped or not : bool
+        False if the daemon wasn't running
+    """
+    connection = _connect(timeout=DAEMON_TIMEOUT)
+
+    if connection==None:
+        return False
+
+    with connection, connection.makefile('rwb') as file:
+        _send(file, {'stop' : True})
+        _receive(file)
+
+    return True
+
+
+class _Output:
+    """File-like object sending the text written into it (like print()s of commands) to the client"""
+
+    def __init__(self, file):
+        self.file = file
+        #threads of concurrent uploads and downloads print together
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        if len(text) > 0:
+            with self.lock:
+                _send(self.file, {'out' : text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def serve(run_command):
+    """
+    Runs the gd daemon : listens on the unix socket and runs the commands forwarded by forward_command(),
+    one at a time, until stop_daemon() is called. The outputs and inputs of the commands are passed
+    to and from the clients.
+
+    Parameters
+    -------------
+    run_command : function
+        run_command(cwd, func, args) runs a gd command and returns its exit status
+
+    Returns
+    -------------
+    None
+    """
+    socket_path = daemon_socket_path()
+
+    if daemon_running():
+        print("gd daemon is already running.")
+        return
+
+    if _socket_dir(create=True)==None:
+        print("gd daemon not started : " + os.path.dirname(socket_path) + " must be a folder accessible only by this user.")
+        return
+
+    #a socket file left behind by a daemon which didn't stop properly
+    if os.path.lexists(socket_path):
+        os.remove(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    #only the user running the daemon can forward commands to it, from the moment the socket is made
+    umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(umask)
+
+    server.listen()
+
+    try:
+        while True:
+            connection, _ = server.accept()
+
+            if _peer_uid(connection) not in (None, os.getuid()):
+                connection.close()
+                continue
+
+            with connection, connection.makefile('rwb') as file:
+                request = _receive(file)
+
+                if request==None:
+                    continue
+
+                if request.get('stop'):
+                    _send(file, {'exit' : 0})
+                    break
+
+                output = _Output(file)
+
+                def remote_input(prompt=''):
+                    _send(file, {'input' : prompt})
+                    reply = _receive(file)
+                    if reply==None:
+                        raise EOFError("gd client disconnected")
+                    return reply['line']
+
+                stdout, stderr, local_input = sys.stdout, sys.stderr, builtins.input
+                sys.stdout, sys.stderr, builtins.input = output, output, remote_input
+
+                try:
+                    status = run_command(request['cwd'], request['func'], request['args'])
+                except Exception:
+                    status = 1
+                    try:
+                        traceback.print_exc()
+                    except OSError:
+                        pass
+                finally:
+                    sys.stdout, sys.stderr, builtins.input = stdout, stderr, local_input
+
+                try:
+                    _send(file, {'exit' : status})
+                except OSError:
+                    #client disconnected before the command finished
+                    pass
+    finally:
+        server.close()
+        os.remove(socket_path)
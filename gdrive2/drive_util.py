@@ -3,13 +3,61 @@
 
 import os
 import re
-from apiclient import errors
-import numpy as np
+import json
 import fnmatch
 import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+#cache_util.py contains functions to cache drive metadata
+#index_util.py contains functions of the local mirror of drive folders
+#hash_util.py contains functions to hash local files
+#transport_util.py contains functions to get http objects for requests and to retry them
+if __name__ == 'drive_util':
+    from cache_util import *
+    from index_util import *
+    from hash_util import *
+    from transport_util import *
+else:
+    from .cache_util import *
+    from .index_util import *
+    from .hash_util import *
+    from .transport_util import *
 
 #when my drive is the current drive
 DEFAULT_ROOT = 'root'
+#Maximum length of the 'q' string when contents of many folders are listed in one query
+MAX_QUERY_LENGTH = 6000
+#Maximum no. of calls in a batch request (limit set by drive)
+MAX_BATCH_SIZE = 100
+
+#Metadata fields requested by each kind of call (drive returns only these instead of the whole metadata)
+FIELDS = {
+        'id' : "id",
+        'type' : "mimeType",
+        'new' : "id,mimeType",
+        'ancestor' : "title,parents(id)",
+        'match' : "id,title,mimeType",
+        'existing' : "id,title,quotaBytesUsed,fileSize,md5Checksum",
+        #metadata of the listed files, used by list_all_contents() and download()
+        'record' : "id,title,mimeType,parents(id),fileSize,quotaBytesUsed,md5Checksum,modifiedDate"
+        }
+
+def list_fields(fields):
+    """Returns the fields string of a files list request which returns only fields of each file"""
+    return "nextPageToken,items(" + fields + ")"
+
+def quote_query(value):
+    """Escapes the backslashes and single quotes of a value put in quotes in a 'q' string"""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+#Bytes read per request when downloading files
+DOWNLOAD_CHUNK_SIZE = 32*1024*1024
+#Bytes sent per request when uploading files (must be a multiple of 256 kB)
+UPLOAD_CHUNK_SIZE = 32*1024*1024
+#Extension of partially downloaded files
+PART_EXT = '.part'
+
 
 def isdir(drive, file_id):
     """
@@ -36,14 +84,139 @@ def isdir(drive, file_id):
 
     else:	
 	    file = drive.CreateFile({'id' : file_id})
-	    fetchMetadata(file, fields="mimeType")
+	    fetchMetadata(file, fields=FIELDS['type'])
 	    
 	    if 'folder' in file['mimeType']:
 	        return True
 	    else:
 	        return False
 
-def query_to_paths(drive, query, path, path_id=None, tier='all', path_search=False, default_root=DEFAULT_ROOT):
+def parse_query(query):
+    """
+    Parses a query of fnmatch patterns connected by 'and', 'or' and 'not' operators.
+    'and' binds tighter than 'or', so the query is a disjunction of conjunctions.
+    
+    Parameters
+    -----------
+    query : string
+        query without the '%f ' or '%d ' type prefix
+    
+    Returns
+    -----------
+    parsed query : list
+        [[(is_not, pattern), (is_not, pattern), ...], ...] 
+        
+        The inner lists are joined by 'or' and the patterns in each list are joined by 'and'
+    
+    """
+    parsed_query = []
+    
+    for iquery in re.split(r"\Wor\W", query):
+        words = shlex.split(iquery)
+        terms = []
+        is_not = False
+        expect_pattern = True
+        
+        for word in words:
+            if word == 'not' and expect_pattern:
+                is_not = not is_not
+            elif word == 'and' and not expect_pattern:
+                expect_pattern = True
+            elif expect_pattern:
+                terms.append((is_not, word))
+                is_not = False
+                expect_pattern = False
+        
+        if len(terms) > 0:
+            parsed_query.append(terms)
+    
+    return parsed_query
+
+
+def literal_prefix(pattern):
+    """Returns the leading letters and digits of an fnmatch pattern, before any wildcard or punctuation"""
+    return re.match('[A-Za-z0-9]*', pattern).group()
+
+
+def compile_query(parsed_query):
+    """
+    Compiles a parsed query (see parse_query()) into a drive 'q' clause on titles, which is true
+    for every title matching the query. Each pattern starting with letters or digits becomes a
+    title contains '<leading letters and digits>' clause. The query must still be matched by the 
+    listed titles, since the clause also lets through titles not matching the patterns.
+    
+    Parameters
+    -----------
+    parsed_query : list
+        as returned by parse_query()
+    
+    Returns
+    -----------
+    'q' clause : string or None
+        None if the query can't narrow down the titles (like '*.csv' or 'not abc*')
+    
+    """
+    or_clauses = []
+    
+    for terms in parsed_query:
+        #negated patterns can't narrow down the titles
+        prefixes = [literal_prefix(pattern) for is_not, pattern in terms if not is_not]
+        and_clauses = ["title contains '" + prefix + "'" for prefix in prefixes if prefix != '']
+        
+        if len(and_clauses) == 0:
+            return None
+        
+        or_clauses.append("(" + " and ".join(and_clauses) + ")")
+    
+    if len(or_clauses) == 0:
+        return None
+    
+    return " or ".join(or_clauses)
+
+
+def compile_matcher(parsed_query):
+    """
+    Compiles a parsed query (see parse_query()) into one regular expression, so that a name is
+    matched against all the patterns in a single call. Each 'and' of patterns becomes a series of 
+    lookaheads, (?=pattern) or (?!pattern) for 'not', and the conjunctions are joined by '|'.
+    
+    Parameters
+    -----------
+    parsed_query : list
+        as returned by parse_query()
+    
+    Returns
+    -----------
+    compiled query : re.Pattern
+        its match() method returns a match (possibly empty) only for the names matching the query.
+        Names are compared case-insensitively where fnmatch does so (on Windows).
+    
+    """
+    or_regexes = []
+    
+    for terms in parsed_query:
+        and_regex = ''
+        for is_not, pattern in terms:
+            if is_not:
+                and_regex += '(?!' + fnmatch.translate(pattern) + ')'
+            else:
+                and_regex += '(?=' + fnmatch.translate(pattern) + ')'
+        or_regexes.append(and_regex)
+    
+    if len(or_regexes) == 0:
+        #empty queries match nothing
+        or_regexes = ['(?!)']
+    
+    #fnmatch.fnmatch() normalizes the case of names and patterns (os.path.normcase)
+    if os.path.normcase('A') == 'a':
+        flags = re.IGNORECASE
+    else:
+        flags = 0
+    
+    return re.compile('|'.join(or_regexes), flags)
+
+
+def query_to_paths(drive, query, path, path_id=None, tier='all', path_search=False, default_root=DEFAULT_ROOT, jobs=1):
     """
     Used in gdrive2.find function to obtain paths from queries.
     A query includes fnmatch patterns connected by 'and' and/or 'or' operators
@@ -65,6 +238,8 @@ def query_to_paths(drive, query, path, path_id=None, tier='all', path_search=Fal
         This is similar to use of ** instead of * in a glob pattern.
     default_root : string (optional)
         The id of the drive.    
+    jobs : int (optional)
+        number of folders listed concurrently
     
 
     Notes
@@ -90,123 +265,78 @@ def query_to_paths(drive, query, path, path_id=None, tier='all', path_search=Fal
 
     
     """
-    #Listing all paths
-    (paths_list, ids_list, _) = list_all_contents(path, init_folder_id=path_id, drive=drive, dynamic_show=False, tier=tier, default_root=default_root)
-    full_paths_list = paths_list.copy()
-    if not path_search:
-        for i, path in enumerate(paths_list):
-            paths_list[i] = re.split('[/\\\\]', path)[-1]
-    
     #Default file type : anything    
     file_type = None
     
     #Checking if folder
     if query.startswith('%f '):
         file_type = 'f'
-        query = query.strip('%f ')
+        query = query[3:]
     #or if a file
     elif query.startswith('%d '):
         file_type = 'd'
-        query = query.strip('%d ')
-    
-    #Splitting by 'or' operator
-    query_list = re.split(r"(\Wor\W)+", query)
-    op_list = np.array([])
-    
-    #considering each query_list item separately
-    for iquery in query_list:
-        path_ind_list = shlex.split(iquery)
-        is_not = False               # assume no 'not' is present
-        file_cond = path_ind_list[0] # initial condition
-        path_ind_list[0] = []        # empty that location in path_ind_list
-        
-        #checks if not is present
-        if file_cond == 'not':
-            _ = path_ind_list.pop(0) #remove not's location in list
-            file_cond = path_ind_list[0] #set the next element as initial condition
-            path_ind_list[0] = []       #empty that location
-            is_not = True
-        
-        #if starting and trailing apostrophies are present, remove them
-        if "\"" in file_cond or "'" in file_cond:
-            file_cond = re.split("\"|\'", file_cond)[1]
-        
-        #Matching the first condition
-        for j, path_j in enumerate(paths_list):
-            match_found = fnmatch.fnmatch(path_j, file_cond) #fnmatch
-            if (match_found and not is_not) or (is_not and not match_found):
-                path_ind_list[0] += [j]
-        
-        is_not = False #resetting 'not' status
-        
-        #'and' logic operation
-        op = None
-        op_list_i = path_ind_list[0]
-        
-        if len(path_ind_list)>1:
-            
-            for ii in path_ind_list[1:]:
-                
-                if ii == 'and' and op == None:
-                    op = 'and'
-                    continue
-                
-                #checks if not is present
-                if ii == 'not' and op == 'and':
-                    is_not = not is_not
-                    continue
-        
-                if op == 'and':
-                    j = 0
-                    while j<len(op_list_i):
-                        match_found = fnmatch.fnmatch(paths_list[op_list_i[j]], ii)
-                        if (match_found and is_not) or ((not match_found) and not is_not):
-                            _ = op_list_i.pop(j)
-                            continue
-                        j+=1
-                    op = None
-                
-                is_not = False #resetting is_not value
-            
-        #'or' logic operation
-        if len(op_list)==0:
-            op_list = np.array(op_list_i)
-        else:
-            op_list = np.unique(np.concatenate((op_list, op_list_i))).astype(int)
+        query = query[3:]
+    
+    parsed_query = parse_query(query)
     
-    #Return empty lists if no query matched
-    if len(op_list)==0:
-        return ([], [])
+    #Narrowing down the listing on the drive's side.
+    drive_query = None
+    folder_clause = "mimeType = 'application/vnd.google-apps.folder'"
+    
+    if path_search:
+        title_clause = None
+    else:
+        title_clause = compile_query(parsed_query)
     
-    #updating paths_list and ids_list
-    full_paths_list = list(np.array(full_paths_list)[op_list])
-    ids_list = list(np.array(ids_list)[op_list])
+    if drive != None and (tier == 'curr' or tier == 1):
+        #contents of the listed folders are not listed, so the files and folders can be filtered
+        clauses = []
+        
+        if file_type == 'f':
+            clauses.append("mimeType != 'application/vnd.google-apps.folder'")
+        elif file_type == 'd':
+            clauses.append(folder_clause)
+        
+        if title_clause != None:
+            clauses.append("(" + title_clause + ")")
+        
+        if len(clauses) > 0:
+            drive_query = " and ".join(clauses)
     
-    if file_type==None:
-        return (full_paths_list, ids_list)
+    elif drive != None and (tier != 'all' or file_type == 'f'):
+        #Folders are always listed, since their contents are listed too. With tier = 'all', only the files and
+        #empty folders are returned, so unmatched titles could make folders look empty unless folders are excluded (%f).
+        if file_type == 'd':
+            drive_query = folder_clause
+        
+        elif title_clause != None:
+            drive_query = folder_clause + " or " + title_clause
     
-    #Now checking for the required file type
-    count = 0
-    list_len = len(ids_list)
-    remove_id = False
+    #Listing all paths
+    (paths_list, ids_list, types_list, _) = list_all_contents(path, init_folder_id=path_id, drive=drive, dynamic_show=False, tier=tier, 
+                                                              get_types=True, default_root=default_root, jobs=jobs, query=drive_query)
     
-    while count<list_len:
-        file_id = ids_list[count]
-        if isdir(drive, file_id):
-            if file_type == 'f':
-                remove_id = True
+    #Matching names (or paths) in one pass
+    match = compile_matcher(parsed_query).match
+    
+    if path_search:
+        keep_list = [match(path_i) != None for path_i in paths_list]
+    else:
+        keep_list = [match(re.split('[/\\\\]', path_i)[-1]) != None for path_i in paths_list]
+    
+    #Checking for the required file type
+    if file_type != None:
+        if drive==None:
+            #types of local contents aren't listed in the order of paths
+            isdir_list = [isdir(drive, path_i) if keep else False for path_i, keep in zip(ids_list, keep_list)]
         else:
-            if file_type == 'd':
-                remove_id = True
-        
-        if remove_id:
-            _ = ids_list.pop(count)
-            _ = full_paths_list.pop(count)
-            remove_id = False
-            list_len = len(ids_list)
-            continue
+            #mimeTypes were listed along with the paths
+            isdir_list = ['folder' in mime_type for mime_type in types_list]
         
-        count+=1
+        keep_list = [keep and is_dir == (file_type == 'd') for keep, is_dir in zip(keep_list, isdir_list)]
+    
+    full_paths_list = [path_i for path_i, keep in zip(paths_list, keep_list) if keep]
+    ids_list = [file_id for file_id, keep in zip(ids_list, keep_list) if keep]
     
     return (full_paths_list, ids_list)
     
@@ -266,6 +396,10 @@ def parse_drive_path(path, drive, parent_id, default_root=DEFAULT_ROOT):
         else:
             break
     
+    #absolute paths don't need the path of the parent
+    if len(path_list) == init_len and not (path_list[0] == '' and len(path_list)>1):
+        return path
+    
     base_path, _ = get_path_from_id(drive, parent_id_i, default_root=default_root)
         
     if len(path_list)==0:
@@ -276,9 +410,6 @@ def parse_drive_path(path, drive, parent_id, default_root=DEFAULT_ROOT):
         new_path = base_path + '/'.join(path_list)
         return new_path
     
-    if len(path_list) == init_len:
-        return path
-    
     if base_path=='':
         return '/'.join(path_list)
     else:
@@ -288,7 +419,8 @@ def parse_drive_path(path, drive, parent_id, default_root=DEFAULT_ROOT):
 def fetchMetadata(drive_file, fields=None):
     """
     A replica of FetchMetadata() from GoogleDriveFile class of pyDrive 1.3.1
-    Changes made : replaced 'supportsTeamDrives' with 'supportsAllDrive'
+    Changes made : replaced 'supportsTeamDrives' with 'supportsAllDrive', and the request
+    is retried with backoff (see transport_util.call_with_retry())
 
     Parameters
     -------------
@@ -301,6 +433,11 @@ def fetchMetadata(drive_file, fields=None):
     -------------
     None
         Updates drive_file with metadata.    
+    
+    Notes
+    -------------
+    Raises the HttpError of the request if it fails (after the retries),
+    and pydrive's FileNotUploadedError if drive_file has no id.
     """
 
     if fields==None:
@@ -308,25 +445,20 @@ def fetchMetadata(drive_file, fields=None):
     
     file_id = drive_file.metadata.get('id') or drive_file.get('id')
     
-    if file_id:
-      try:
-        metadata = drive_file.auth.service.files().get(
-          fileId=file_id,
-          fields=fields,
-          # Support All drives -- Changed this
-          supportsAllDrives=True
-        ).execute(http=drive_file.http)
-        
-      except errors.HttpError as error:
-        reason = error._get_reason
-        print(str(reason))
-      
-      else:
-        drive_file.uploaded = True
-        drive_file.UpdateMetadata(metadata)
+    if not file_id:
+      #PyDrive is imported only when a command makes drive requests
+      from pydrive.files import FileNotUploadedError
+      raise FileNotUploadedError()
     
-    else:
-      print("FileNotUploadedError()")
+    metadata = execute_request(drive_file.auth.service.files().get(
+      fileId=file_id,
+      fields=fields,
+      # Support All drives -- Changed this
+      supportsAllDrives=True
+    ), http=get_http(drive_file))
+    
+    drive_file.uploaded = True
+    drive_file.UpdateMetadata(metadata)
       
 
 def create_folders_path(path):
@@ -357,7 +489,7 @@ def create_folders_path(path):
         if not os.path.exists(curr_path):
             os.mkdir(curr_path)
 
-def create_folder(folder_name, parent_folder_id, drive):
+def create_folder(folder_name, parent_folder_id, drive, default_root=DEFAULT_ROOT):
     """
     Creates folder in drive with title = folder_name
     
@@ -368,6 +500,8 @@ def create_folder(folder_name, parent_folder_id, drive):
     parent_folder_id : string
         ID of the parent folder
     drive : pydrive.GoogleDrive() object
+    default_root : string (optional)
+        id of the drive
     
     Returns
     ------------
@@ -376,7 +510,12 @@ def create_folder(folder_name, parent_folder_id, drive):
     """
     
     folder = drive.CreateFile({'parents' : [{'id' : parent_folder_id}],'mimeType' : 'application/vnd.google-apps.folder', 'title' : folder_name})
-    folder.Upload(param={'supportsAllDrives' : True})
+    #retried only if throttled, as retrying after other errors may create the folder twice.
+    #PyDrive pops 'http' from param and adds the body to it, so each attempt gets a new dict
+    call_with_retry(lambda: folder.Upload(param={'supportsAllDrives' : True, 'fields' : FIELDS['record'], 'http' : get_http(drive)}),
+                    idempotent=False)
+    add_cached_child(default_root, parent_folder_id, folder_name, folder['id'], folder['mimeType'])
+    index_add(default_root, parent_folder_id, dict(folder))
     return folder['id']
 
 def get_path_from_id(drive, file_id, default_root=DEFAULT_ROOT):
@@ -386,6 +525,9 @@ def get_path_from_id(drive, file_id, default_root=DEFAULT_ROOT):
     A typical drive path must be like this :
         Folder1_title/Folder2_title/Folder3_title or file_title
     
+    The titles and parents of the folders climbed are cached (see cache_util), so
+    paths of files in the same folders are found without fetching their metadata again.
+    
     Parameters
     -------------
     drive : pydrive.GoogleDrive() object
@@ -405,19 +547,42 @@ def get_path_from_id(drive, file_id, default_root=DEFAULT_ROOT):
     path = []
     ids = []
     
-    actual_root = drive.CreateFile({'id' : default_root})
-    fetchMetadata(actual_root, fields="id")
+    actual_root_id = get_cached_root(default_root)
+    
+    if actual_root_id == None:
+        actual_root_id = get_index_root(default_root, default_root)
     
-    while file_id!=actual_root['id']:
-        file = drive.CreateFile({'id' : file_id})
-        fetchMetadata(file)
-        path.append(file['title'])
+    if actual_root_id == None:
+        actual_root = drive.CreateFile({'id' : default_root})
+        fetchMetadata(actual_root, fields=FIELDS['id'])
+        actual_root_id = actual_root['id']
+        cache_root(default_root, actual_root_id)
+    
+    while file_id!=actual_root_id and file_id!=default_root:
+        ancestor = get_cached_ancestor(default_root, file_id)
+        
+        if ancestor == None:
+            ancestor = get_index_ancestor(default_root, file_id)
+        
+        if ancestor == None:
+            file = drive.CreateFile({'id' : file_id})
+            fetchMetadata(file, fields=FIELDS['ancestor'])
+            
+            if len(file['parents'])==0:
+                ancestor = (file['title'], None)
+            else:
+                ancestor = (file['title'], file['parents'][0]['id'])
+            
+            cache_ancestor(default_root, file_id, *ancestor)
+        
+        title, parent_id = ancestor
+        path.append(title)
         ids.append(file_id)
         
-        if len(file['parents'])==0:
+        if parent_id == None:
             break
         
-        file_id = file['parents'][0]['id']
+        file_id = parent_id
         
     ids.append(default_root)
     if "My Drive" in path:
@@ -426,12 +591,14 @@ def get_path_from_id(drive, file_id, default_root=DEFAULT_ROOT):
     return '/'.join(path[::-1]), ids[::-1]
 
 
-def get_id_by_name(name, parent_folder_id, drive, file_type = 'all'):
+def get_id_by_name(name, parent_folder_id, drive, file_type = 'all', default_root=DEFAULT_ROOT, use_index=True):
     
     """
     Returns list of ids for folders or files with title = name in the drive folder
     with id = parent_folder_id
     
+    Results are cached in the cache of the drive (see cache_util) for CACHE_TTL seconds.
+    
 
     Parameters
     --------------
@@ -441,6 +608,12 @@ def get_id_by_name(name, parent_folder_id, drive, file_type = 'all'):
         ID of the parent folder
     drive : pydrive.GoogleDrive() object
     file_type : string (optional)
+    default_root : string (optional)
+        id of the drive
+    use_index : bool (optional)
+        If True, the contents of the folder are read from a fresh index (see gdrive2.index_util), if any.
+        If False, drive is asked, like before creating a folder missing in the index, since the index may
+        not have files made by others after it was refreshed.
     
 
     Notes
@@ -461,28 +634,42 @@ def get_id_by_name(name, parent_folder_id, drive, file_type = 'all'):
     
     """
     
-    try:
-        file_list = drive.ListFile({'q' : "title = '" + name + "' and '" + parent_folder_id + "' in parents and trashed=false",
-                                    'supportsAllDrives' : "true",
-                                    'corpora' : "allDrives",
-                                    'includeItemsFromAllDrives' : "true"
-                                    }).GetList()
-    except:
-        file_list = []
+    cached = get_cached_children(default_root, parent_folder_id, name)
+    
+    if cached == None and use_index:
+        #a fresh index has all the contents of its folders
+        indexed = get_index_children(default_root, parent_folder_id, name)
+        
+        if indexed != None:
+            cached = ([file['id'] for file in indexed], [file['mimeType'] for file in indexed])
+    
+    if cached == None:
+        #errors are raised, since taking them for missing names would create duplicates of existing folders
+        file_list = list_files(drive, "title = '" + quote_query(name) + "' and '" + parent_folder_id + "' in parents and trashed=false",
+                               fields=FIELDS['match'])
+        
+        all_ids = [file['id'] for file in file_list]
+        all_mimes = [file['mimeType'] for file in file_list]
+        
+        #Missing names are not cached as they might be created later
+        if len(all_ids) > 0:
+            cache_children(default_root, parent_folder_id, name, all_ids, all_mimes)
+    
+    else:
+        all_ids, all_mimes = cached
         
     file_id_list = []
     file_mime_list = []
     
-    for file in file_list:
-        file_mime = file['mimeType']
+    for file_id, file_mime in zip(all_ids, all_mimes):
         if file_type == 'folder' and file_mime == 'application/vnd.google-apps.folder':
-            file_id_list.append(file['id'])
+            file_id_list.append(file_id)
             file_mime_list.append(file_mime)
         elif file_type == 'not-folder' and file_mime != 'application/vnd.google-apps.folder':
-            file_id_list.append(file['id'])
+            file_id_list.append(file_id)
             file_mime_list.append(file_mime)
         elif file_type == 'all':
-            file_id_list.append(file['id'])
+            file_id_list.append(file_id)
             file_mime_list.append(file_mime)
         
     return file_id_list, file_mime_list
@@ -559,9 +746,13 @@ def get_path_ids(drive_path, drive, create_missing_folders = True, relative_id =
             parent_folder_id = path_id_list[i-1]
         
         if i < len(path_list) - 1:
-            path_id, _ = get_id_by_name(path_list[i], parent_folder_id, drive, file_type = 'folder')
+            path_id, _ = get_id_by_name(path_list[i], parent_folder_id, drive, file_type = 'folder', default_root=default_root)
         else:
-            path_id, _ = get_id_by_name(path_list[i], parent_folder_id, drive, file_type = path_to)
+            path_id, _ = get_id_by_name(path_list[i], parent_folder_id, drive, file_type = path_to, default_root=default_root)
+        
+        if len(path_id) == 0 and create_missing_folders and not (i == len(path_list) - 1 and path_to == 'not-folder'):
+            #confirming with drive that the folder is missing before creating it
+            path_id, _ = get_id_by_name(path_list[i], parent_folder_id, drive, file_type = 'folder', default_root=default_root, use_index=False)
         
         if len(path_id) > 1:
             raise NameError('More than one folder or file found with the same name : '+ path_list[i] +' in ' + '/'.join(path_list[:i]))
@@ -572,7 +763,7 @@ def get_path_ids(drive_path, drive, create_missing_folders = True, relative_id =
                 path_id_list[i] = 'no-file-found'
                     
             elif create_missing_folders:
-                path_id_list[i] = create_folder(path_list[i], parent_folder_id, drive)
+                path_id_list[i] = create_folder(path_list[i], parent_folder_id, drive, default_root=default_root)
             
             else:
                 raise ValueError("path to file-type: '" + path_to +"' not found with name : "+ path_list[i] +" in '" + '/'.join(path_list[:i]) + "'")
@@ -583,9 +774,480 @@ def get_path_ids(drive_path, drive, create_missing_folders = True, relative_id =
     return path_id_list
  
     
+def batch_execute(drive, requests, idempotent=True):
+    """
+    Executes independent drive API requests as batch requests of upto MAX_BATCH_SIZE calls each,
+    instead of one http request per call.
+    
+    Calls failing with errors worth retrying (like throttled calls) are sent again in the next
+    batch requests, with backoff (see transport_util.retry_delay()).
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    requests : list
+        googleapiclient HttpRequest objects, like drive.auth.service.files().get(fileId=...)
+    idempotent : bool (optional)
+        False if the calls can't be repeated safely, like inserts. They are retried only if throttled.
+    
+    Returns
+    -------------
+    responses and errors : tuple
+        (list of responses, list of errors), in the order of requests.
+        
+        If a call fails, its response is None and its error is the HttpError raised for it.
+        Otherwise its error is None.
+    
+    """
+    responses = [None]*len(requests)
+    errors_list = [None]*len(requests)
+    
+    def callback(request_id, response, exception):
+        responses[int(request_id)] = response
+        errors_list[int(request_id)] = exception
+    
+    pending = list(range(len(requests)))
+    retries = [0]*len(requests)
+    
+    while len(pending) > 0:
+        for start in range(0, len(pending), MAX_BATCH_SIZE):
+            batch = drive.auth.service.new_batch_http_request(callback=callback)
+            
+            for i in pending[start : start + MAX_BATCH_SIZE]:
+                batch.add(requests[i], request_id=str(i))
+            
+            call_with_retry(batch.execute, http=get_http(drive), idempotent=idempotent, credit=False)
+        
+        #each successful call is credited to the retry budget, as each failed call spends from it
+        failed = [i for i in pending if errors_list[i] != None]
+        for _ in range(len(pending) - len(failed)):
+            earn_retry()
+        
+        pending = []
+        delay = 0
+        
+        for i in failed:
+            retry_i = retry_delay(errors_list[i], retries[i], idempotent=idempotent)
+            
+            if retry_i != None:
+                pending.append(i)
+                retries[i] += 1
+                delay = max(delay, retry_i)
+        
+        if len(pending) > 0:
+            time.sleep(delay)
+            wait_throttle()
+    
+    return responses, errors_list
+
+
+def create_folders(folder_names, parent_folder_ids, drive, default_root=DEFAULT_ROOT):
+    """
+    Creates several folders in drive using batch requests.
+    
+    Parameters
+    ------------
+    folder_names : list
+        names of the folders
+    parent_folder_ids : list
+        ids of their parent folders
+    drive : pydrive.GoogleDrive() object
+    default_root : string (optional)
+        id of the drive
+    
+    Returns
+    ------------
+    ids of the created folders : list
+    
+    Notes
+    -------------
+    Raises the error of the first folder that couldn't be created.
+    Folders created before it are still created.
+    """
+    files = drive.auth.service.files()
+    requests = []
+    
+    for folder_name, parent_folder_id in zip(folder_names, parent_folder_ids):
+        body = {'parents' : [{'id' : parent_folder_id}],'mimeType' : 'application/vnd.google-apps.folder', 'title' : folder_name}
+        requests.append(files.insert(body=body, fields=FIELDS['record'], supportsAllDrives=True))
+    
+    responses, errors_list = batch_execute(drive, requests, idempotent=False)
+    
+    for folder_name, parent_folder_id, folder in zip(folder_names, parent_folder_ids, responses):
+        if folder != None:
+            add_cached_child(default_root, parent_folder_id, folder_name, folder['id'], folder['mimeType'])
+            index_add(default_root, parent_folder_id, folder)
+    
+    for error in errors_list:
+        if error != None:
+            raise error
+    
+    return [folder['id'] for folder in responses]
+
+
+def delete_many(drive, file_ids, hard_delete=False, default_root=DEFAULT_ROOT):
+    """
+    Trashes or deletes several files or folders using batch requests.
+    
+    Parameters
+    ---------------
+    drive : pydrive.GoogleDrive() object
+    file_ids : list
+        ids of the files or folders
+    hard_delete : bool (optional)
+        If False, files are moved to trash (default)
+        
+        If True, files are deleted permanently
+    default_root : string (optional)
+        id of the drive
+    
+    Returns
+    --------------
+    errors : list
+        HttpError raised for each id, or None if it was deleted
+    
+    """
+    files = drive.auth.service.files()
+    
+    if hard_delete:
+        requests = [files.delete(fileId=file_id, supportsAllDrives=True) for file_id in file_ids]
+    else:
+        requests = [files.trash(fileId=file_id, fields=FIELDS['id'], supportsAllDrives=True) for file_id in file_ids]
+    
+    _, errors_list = batch_execute(drive, requests)
+    
+    for file_id, error in zip(file_ids, errors_list):
+        if error == None:
+            uncache_id(default_root, file_id)
+            index_remove(default_root, file_id)
+    
+    return errors_list
+
+
+def list_files(drive, query, fields=FIELDS['record']):
+    """
+    Lists all the files/folders (all the pages) satisfying a query with the http object
+    of the current thread.
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    query : string
+        'q' string of the files list query
+    fields : string (optional)
+        metadata fields returned for each file (FIELDS['record'] by default)
+    
+    Returns
+    -------------
+    files : list
+        list of dicts with metadata of the files/folders
+    
+    """
+    http = get_http(drive)
+    param = {'q' : query,
+             'fields' : list_fields(fields),
+             'maxResults' : 1000,
+             'supportsAllDrives' : True,
+             'corpora' : "allDrives",
+             'includeItemsFromAllDrives' : True
+             }
+    
+    file_list = []
+    
+    while True:
+        result = execute_request(drive.auth.service.files().list(**param), http=http)
+        file_list += result['items']
+        
+        if result.get('nextPageToken') == None:
+            break
+        
+        param['pageToken'] = result['nextPageToken']
+    
+    return file_list
+
+
+def get_start_page_token(drive, default_root=DEFAULT_ROOT):
+    """
+    Returns the page token of the drive's changes feed from which the changes made
+    after this call are listed.
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    default_root : string (optional)
+        id of the drive
+    
+    Returns
+    -------------
+    page token : string
+    
+    """
+    param = {'supportsAllDrives' : True}
+    
+    #'root' is the user's 'My Drive', other drive ids are shared drives
+    if default_root != DEFAULT_ROOT:
+        param['driveId'] = default_root
+    
+    return execute_request(drive.auth.service.changes().getStartPageToken(**param), http=get_http(drive))['startPageToken']
+
+
+def list_changes(drive, page_token, default_root=DEFAULT_ROOT):
+    """
+    Lists all the changes in the drive since the page_token was obtained.
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    page_token : string
+        page token from get_start_page_token() or from a previous list_changes()
+    default_root : string (optional)
+        id of the drive
+    
+    Returns
+    -------------
+    changes and new page token : tuple
+        (list of change dicts with 'fileId', 'deleted' and 'file', page token for the next changes)
+    
+    """
+    param = {'pageToken' : page_token,
+             'fields' : "nextPageToken,newStartPageToken,items(fileId,deleted,file(" + FIELDS['record'] + ",labels(trashed)))",
+             'maxResults' : 1000,
+             'includeDeleted' : True,
+             'supportsAllDrives' : True,
+             'includeItemsFromAllDrives' : True
+             }
+    
+    if default_root != DEFAULT_ROOT:
+        param['driveId'] = default_root
+    
+    http = get_http(drive)
+    changes = []
+    
+    while True:
+        result = execute_request(drive.auth.service.changes().list(**param), http=http)
+        changes += result.get('items', [])
+        
+        if 'newStartPageToken' in result:
+            return changes, result['newStartPageToken']
+        
+        param['pageToken'] = result['nextPageToken']
+
+
+def refresh_index(drive, page_token, folder_id, default_root=DEFAULT_ROOT, jobs=1):
+    """
+    Updates the index (see gdrive2.index_util) of a drive with the changes made since page_token,
+    instead of listing the indexed folders again. Cached entries of the changed files are also removed.
+    Folders moved into the indexed folders are listed, since their contents aren't in the changes.
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    page_token : string
+        page token saved when the index was built or last refreshed
+    folder_id : string
+        id of the indexed folder whose page token it is. Only its index is marked as fresh.
+    default_root : string (optional)
+        id of the drive
+    jobs : int (optional)
+        number of folder listings made concurrently (see list_tree())
+    
+    Returns
+    -------------
+    no. of changes and new page token : tuple
+        (no. of changes applied to the index, page token to be saved for the next refresh)
+    
+    """
+    changes, page_token = list_changes(drive, page_token, default_root=default_root)
+    
+    for change in changes:
+        uncache_id(default_root, change['fileId'])
+    
+    count, new_folder_ids = apply_changes(default_root, changes)
+    listed_ids = set()
+    
+    for new_folder_id in new_folder_ids:
+        #folders created inside a new folder are listed with it
+        if new_folder_id in listed_ids:
+            continue
+        
+        records, children = list_tree(drive, new_folder_id, tier='all', jobs=jobs, default_root=default_root, use_index=False)
+        index_add_tree(default_root, children)
+        listed_ids.update(records)
+    
+    mark_index_fresh(default_root, folder_id)
+    
+    return count, page_token
+
+
+def list_children(drive, folder_ids, jobs=1, fields=FIELDS['record'], query=None):
+    """
+    Lists the contents of several drive folders. Instead of one query per folder,
+    the folders are combined into queries like :
+        ('id1' in parents or 'id2' in parents or ...) and trashed=false
+    with each query not longer than MAX_QUERY_LENGTH characters.
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    folder_ids : list
+        ids of the folders to list
+    jobs : int (optional)
+        number of queries made concurrently. If more than 1, the folders are
+        divided into atleast jobs queries.
+    fields : string (optional)
+        metadata fields returned for each file. Must include 'id', 'title' and 'parents(id)'.
+    query : string (optional)
+        'q' clause added to each query with 'and', so that only the matching files are listed
+    
+    Returns
+    -------------
+    contents of the folders : dict
+        {folder_id : list of metadata dicts of the files/folders in the folder}
+        
+        Contents of each folder are sorted by title, irrespective of the order 
+        in which the queries finish.
+    
+    """
+    children = {}
+    for folder_id in folder_ids:
+        children[folder_id] = []
+    
+    #maximum no. of folders in a query so that all the jobs have a query
+    max_folders = -(-len(children) // max(jobs, 1))
+    
+    #grouping the folders into queries
+    queries = []
+    clauses = []
+    
+    if query == None:
+        suffix = " and trashed=false"
+    else:
+        suffix = " and trashed=false and (" + query + ")"
+    
+    query_len = len(suffix)
+    
+    for folder_id in children:
+        clause = "'" + folder_id + "' in parents"
+        
+        if len(clauses) > 0 and (query_len + len(clause) + 4 > MAX_QUERY_LENGTH or len(clauses) == max_folders):
+            queries.append(clauses)
+            clauses = []
+            query_len = len(suffix)
+        
+        clauses.append(clause)
+        query_len += len(clause) + 4
+    
+    if len(clauses) > 0:
+        queries.append(clauses)
+    
+    queries = ["(" + " or ".join(clauses) + ")" + suffix for clauses in queries]
+    
+    if jobs > 1 and len(queries) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            files_lists = list(executor.map(lambda query : list_files(drive, query, fields=fields), queries))
+    else:
+        files_lists = [list_files(drive, query, fields=fields) for query in queries]
+    
+    for file_list in files_lists:
+        for file in file_list:
+            for parent in file['parents']:
+                if parent['id'] in children:
+                    children[parent['id']].append(file)
+    
+    for folder_id in children:
+        children[folder_id].sort(key=lambda file : (file['title'], file['id']))
+    
+    return children
+
+
+def list_tree(drive, init_folder_id, tier='all', jobs=1, default_root=DEFAULT_ROOT, use_index=True, query=None):
+    """
+    Lists the nested contents of a drive folder breadth-first. All the folders in 
+    a tier of the hierarchy are listed together using list_children()
+    
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object
+    init_folder_id : string
+        id of the folder (or file) to list
+    tier : string or int (optional)
+        'all' lists all nested folders
+        
+        'curr' lists only the folder at init_folder_id
+        
+        If int, folders upto that tier are listed. tier = 1 is same as tier = 'curr'
+    jobs : int (optional)
+        number of folder listings made concurrently in each tier
+    default_root : string (optional)
+        id of the drive
+    use_index : bool (optional)
+        If True, the tree is read from the local index (see gdrive2.index_util) when
+        the folder is in an index built within INDEX_TTL seconds
+    query : string (optional)
+        'q' clause limiting the listed files (see list_children()). Folders must match it for
+        their contents to be listed. The index, if used, returns all the files.
+    
+    Returns
+    -------------
+    metadata and contents : tuple
+        (records, children)
+        
+        records : dict
+            {id : metadata dict} of init_folder_id and all the listed files and folders
+        
+        children : dict
+            {folder_id : list of metadata dicts of files/folders in the folder} of all the listed folders
+    
+    """
+    #a fresh index of the folder is used instead of listing it again
+    if use_index:
+        indexed = index_tree(default_root, init_folder_id, tier=tier)
+        if indexed != None:
+            return indexed
+    
+    init_file = drive.CreateFile({'id' : init_folder_id})
+    fetchMetadata(init_file, fields=FIELDS['record'])
+    
+    records = {init_folder_id : init_file}
+    children = {}
+    
+    #listed contents have actual ids as parents instead of aliases like 'root'
+    root_id = init_file['id']
+    records[root_id] = init_file
+    
+    if 'folder' in init_file['mimeType']:
+        tier_folders = [root_id]
+    else:
+        tier_folders = []
+    
+    depth = 0
+    
+    while len(tier_folders) > 0:
+        
+        if tier == 0 or (tier == 'curr' and depth == 1) or (type(tier) == int and depth >= tier):
+            break
+        
+        tier_children = list_children(drive, tier_folders, jobs=jobs, query=query)
+        children.update(tier_children)
+        tier_folders = []
+        
+        for folder_id in tier_children:
+            for file in tier_children[folder_id]:
+                records[file['id']] = file
+                if 'folder' in file['mimeType'] and not file['id'] in children and not file['id'] in tier_folders:
+                    tier_folders.append(file['id'])
+        
+        depth += 1
+    
+    if root_id in children:
+        children[init_folder_id] = children[root_id]
+    
+    return records, children
+
+
 def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
                       dynamic_show=False, tier = 'all', show_ids=False, 
-                      get_types = False, default_root=DEFAULT_ROOT):
+                      get_types = False, default_root=DEFAULT_ROOT, jobs=1, get_records=False, query=None):
         
     """
     Lists "relative" paths to nested files and folders in a folder with path = folder_path
@@ -598,6 +1260,9 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
         relative paths are Folder2_title and Folder2_title/Folder3_title
     
     If a file is present at init_folder_path, just returns the file_name and id
+    
+    Drive folders are listed breadth-first with list_tree(), which lists all the folders
+    in a tier together instead of making one query per folder.
 
 
     Parameters
@@ -637,15 +1302,27 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
     
     default_root : string (optional)
         id of the drive
+    
+    jobs : int (optional)
+        number of drive folders listed concurrently
+    
+    get_records : bool (optional)
+        If True, the metadata dicts of the contents, as listed from the drive, are also
+        returned. These have the id, title, mimeType, fileSize, md5Checksum, modifiedDate etc.
+        so the contents need not be fetched again. Works only for drive.
+    
+    query : string (optional)
+        'q' clause limiting the drive files listed (see list_tree()). Works only for drive.
 
 
     Returns
     ---------------
     contnets of the folder : tuple
-        a tuple of 3 **(or 4)** elements
+        a tuple of 3 **(or 4 or 5)** elements
             (the paths_list with the relative paths, 
             the list of ids of contents if used for gdrive2 (same as paths_list for drive = None),
             **the list of file_types (included only if get_types = True),**
+            **the list of metadata dicts (included only if get_records = True),**
             total_count = the number of 'non-folder' items in the folder at folder_path)
         
 
@@ -657,7 +1334,7 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
     else:
         system = 'drive'  
 
-    def list_all_contents_recur(folder_path, folder_id, paths_list, ids_list, type_list, file_count, tier):
+    def list_all_contents_recur(folder_path, folder_id, paths_list, ids_list, type_list, records_list, file_count, tier):
         
         #if tiers end
         if tier==0:
@@ -725,16 +1402,12 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
         
         #--------------------------------------------DRIVE-------------------------------
         elif system == 'drive':
-            file = drive.CreateFile({'id' : folder_id})
-            fetchMetadata(file)
+            #metadata and contents were already listed by list_tree()
+            file = records[folder_id]
             
             if 'folder' in file['mimeType']:
                 #if folder_path leads to a folder, list contents
-                sub_folders_list = drive.ListFile({'q' : " '" + folder_id + "' in parents and trashed=false",
-                                                   'supportsAllDrives' : "true",
-                                                   'corpora' : "allDrives",
-                                                   'includeItemsFromAllDrives' : "true"
-                                                   }).GetList()
+                sub_folders_list = children[folder_id]
                 sub_folders = [file['title'] for file in sub_folders_list]
                 sub_folder_ids = [file['id'] for file in sub_folders_list]
                 sub_types = [file['mimeType'] for file in sub_folders_list]
@@ -749,6 +1422,7 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
                     
                     ids_list+=sub_folder_ids
                     type_list += sub_types
+                    records_list += sub_folders_list
 
                     if dynamic_show:
                         
@@ -783,6 +1457,7 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
                         paths_list.append(folder_path)
                     ids_list.append(folder_id)
                     type_list.append(file['mimeType'])
+                    records_list.append(file)
                 
                 if dynamic_show:
                     fsize = round(float(file['quotaBytesUsed'])/1000, 2)
@@ -806,6 +1481,7 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
                         paths_list.append(folder_path)
                     ids_list.append(folder_id)
                     type_list.append(file['mimeType'])
+                    records_list.append(file)
 
                 if dynamic_show:
                     if not show_ids:
@@ -824,15 +1500,16 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
         
         for path, path_id in zip(sub_folder_paths, sub_folder_ids):
             if type(tier)==int:
-                file_count += list_all_contents_recur(path, path_id, paths_list, ids_list, type_list, 0, tier-1)
+                file_count += list_all_contents_recur(path, path_id, paths_list, ids_list, type_list, records_list, 0, tier-1)
             else:
-                file_count += list_all_contents_recur(path, path_id, paths_list, ids_list, type_list, 0, tier)
+                file_count += list_all_contents_recur(path, path_id, paths_list, ids_list, type_list, records_list, 0, tier)
         
         return file_count
     
     paths_list = []
     ids_list = []
     type_list = []
+    records_list = []
     
     if system == 'local':
         init_folder_id = init_folder_path #if system is local
@@ -846,16 +1523,142 @@ def list_all_contents(init_folder_path, init_folder_id=None, drive=None,
             except:
                 list_path_ids = get_path_ids(init_folder_path, drive, create_missing_folders = False, path_to = 'not-folder', default_root=default_root)
                 init_folder_id = list_path_ids[-1]
+        
+        records, children = list_tree(drive, init_folder_id, tier=tier, jobs=jobs, default_root=default_root, query=query)
                 
-    total_count = list_all_contents_recur(init_folder_path, init_folder_id, paths_list, ids_list, type_list, 0, tier)    
+    total_count = list_all_contents_recur(init_folder_path, init_folder_id, paths_list, ids_list, type_list, records_list, 0, tier)    
+    
+    contents = [paths_list, ids_list]
     
     if get_types:
-        return paths_list, ids_list, type_list, total_count
+        contents.append(type_list)
+    
+    if get_records:
+        contents.append(records_list)
+    
+    return (*contents, total_count)
+
+
+def query_upload_session(http, resume_uri, file_size):
+    """
+    Asks drive for the bytes received in a resumable upload session, with an empty PUT request
+    to the session uri with the header 'Content-Range: bytes */<file_size>'.
+    
+    Parameters
+    --------------
+    http : httplib2.Http() object
+    resume_uri : string
+        uri of the upload session
+    file_size : int
+        size of the file being uploaded
+    
+    Returns
+    -------------
+    bytes received and metadata : tuple
+        (no. of bytes received, metadata dict of the uploaded file or None if the upload isn't complete)
+    
+    Notes
+    -------------
+    Raises HttpError if the session can't be resumed, like when it expired (404 or 410)
+    """
+    from googleapiclient.errors import HttpError
+    
+    resp, content = http.request(resume_uri, method='PUT', body='',
+                                 headers={'Content-Range' : 'bytes */' + str(file_size), 'Content-Length' : '0'})
+    status = int(resp.status)
+    
+    if status in (200, 201):
+        return file_size, json.loads(content)
+    
+    if status == 308:
+        #'Range: bytes=0-<last byte received>', missing if no bytes were received
+        if 'range' in resp:
+            return int(resp['range'].split('-')[-1]) + 1, None
+        return 0, None
+    
+    raise HttpError(resp, content, uri=resume_uri)
+
+
+def resumable_upload(drive, curr_file_path, drive_folder_id, title, file_id=None, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Uploads a file in chunks using a resumable upload session.
+    
+    Each chunk is retried with exponential backoff (see transport_util.call_with_retry()). The session uri
+    is saved in the .gd folder, so that an interrupted upload of the same file is resumed
+    from the last byte received by drive the next time (see query_upload_session()), instead of being sent again.
+    
+
+    Parameters
+    --------------
+    drive : pydrive.GoogleDrive() object
+    curr_file_path : string
+        path to file on current system
+    drive_folder_id : string
+        id of drive folder into which upload will be done
+    title : string
+        title of the file on drive
+    file_id : string (optional)
+        id of the drive file to be overwritten. If None, a new file is created.
+    chunk_size : int (optional)
+        bytes sent per request (UPLOAD_CHUNK_SIZE by default)
+    
+
+    Returns
+    -------------
+    metadata : dict
+        metadata (FIELDS['record']) of the uploaded file
+    
+    """
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload
+    
+    key = upload_session_key(curr_file_path, drive_folder_id, title, file_id)
+    resume_uri = get_upload_session(key, curr_file_path)
+    received = 0
+    
+    if resume_uri != None:
+        try:
+            received, response = call_with_retry(query_upload_session, get_http(drive), resume_uri,
+                                                 os.path.getsize(curr_file_path))
+        except HttpError:
+            #session expired : starting a new one
+            remove_upload_session(key)
+            resume_uri = None
+        else:
+            if response != None:
+                remove_upload_session(key)
+                return response
+    
+    media = MediaFileUpload(curr_file_path, chunksize=chunk_size, resumable=True)
+    
+    if file_id == None:
+        request = drive.auth.service.files().insert(body={'title' : title, 'parents' : [{'id' : drive_folder_id}]},
+                                                    media_body=media, fields=FIELDS['record'], supportsAllDrives=True)
     else:
-        return paths_list, ids_list, total_count
+        request = drive.auth.service.files().update(fileId=file_id, media_body=media, fields=FIELDS['record'], supportsAllDrives=True)
+    
+    request.http = get_http(drive)
+    
+    if resume_uri != None:
+        #the saved session is continued from the bytes received by drive
+        request.resumable_uri = resume_uri
+        request.resumable_progress = received
+    
+    response = None
+    while response == None:
+        #a failed chunk leaves the request in an error state, in which the next call
+        #asks drive for the bytes received and resumes from there
+        _, response = call_with_retry(request.next_chunk)
+        
+        if resume_uri == None and request.resumable_uri != None:
+            resume_uri = request.resumable_uri
+            save_upload_session(key, curr_file_path, resume_uri)
+    
+    remove_upload_session(key)
+    return response
 
 
-def upload_file_by_id(curr_file_path, drive_folder_id, drive, prompt='ask', file_count=1, total_count=1):
+def upload_file_by_id(curr_file_path, drive_folder_id, drive, prompt='ask', file_count=1, total_count=1, default_root=DEFAULT_ROOT, chunk_size=UPLOAD_CHUNK_SIZE, md5s=None):
     
     """
     Uploads a file with current path = curr_file_path on system into
@@ -877,6 +1680,13 @@ def upload_file_by_id(curr_file_path, drive_folder_id, drive, prompt='ask', file
         1 (default) to print the file's count when uploading folder
     total_count : int (optional)
         1 (DEFAULT) to print the total files in a folder when uploading
+    default_root : string (optional)
+        id of the drive
+    chunk_size : int (optional)
+        bytes sent per request (UPLOAD_CHUNK_SIZE by default)
+    md5s : dict (optional)
+        md5 checksums of local files already known, like the ones of the stage manifest :
+        {absolute file path : md5 checksum}. Used with prompt = 'update' instead of hashing the file.
          
 
     Notes:
@@ -890,6 +1700,8 @@ def upload_file_by_id(curr_file_path, drive_folder_id, drive, prompt='ask', file
         'overwrite' or 'o' overwrites the file if it already exists
         
         'copy' creates an extra copy
+        
+        'update' or 'u' skips file if the drive file has the same size and md5 checksum, overwrites it otherwise
     
 
     Returns
@@ -906,37 +1718,56 @@ def upload_file_by_id(curr_file_path, drive_folder_id, drive, prompt='ask', file
     file_name = re.split('[\\\\/]', curr_file_path)[-1]
     file_size = round(os.path.getsize(curr_file_path)/1000, 2)
     
-    file = drive.CreateFile({'parents' : [{'id' : drive_folder_id}]})
-    file['title'] = file_name
-    print('Upload {}/{} '.format(file_count,total_count) + file_name + ' ({} kB):'.format(file_size), end='')
-    file.SetContentFile(curr_file_path)    
+    #message is printed in one go, so that lines from concurrent uploads don't mix
+    message = 'Upload {}/{} '.format(file_count,total_count) + file_name + ' ({} kB):'.format(file_size)
     
     #Checking if file already exists :
-    files_list = drive.ListFile({'q' : "title = '" + file_name + "' and '" + drive_folder_id + "' in parents and trashed=false",
-                                 'supportsAllDrives' : "true",
-                                 'corpora' : "allDrives",
-                                 'includeItemsFromAllDrives' : "true"
-                                 }).GetList()
+    files_list = list_files(drive, "title = '" + quote_query(file_name) + "' and '" + drive_folder_id + "' in parents and trashed=false", fields=FIELDS['existing'])
     
+    files_names = [f['title'] for f in files_list]
     try:
-        files_names = [f['title'] for f in files_list]
         match = files_names.index(file_name)
+    except ValueError:
+        match = None
+    
+    if match == None:
+        #file doesn't exist in the folder
+        file = resumable_upload(drive, curr_file_path, drive_folder_id, file_name, chunk_size=chunk_size)
+        add_cached_child(default_root, drive_folder_id, file_name, file['id'], file['mimeType'])
+        index_add(default_root, drive_folder_id, file)
+        print(message + 'Done!')
+    
+    else:
         drive_file_size = round(float(files_list[match]['quotaBytesUsed'])/1000, 2)
-        print(' already ({} kB) exists : \n'.format(drive_file_size), end='')
+        message += ' already ({} kB) exists : \n'.format(drive_file_size)
+        
+        if prompt=='u' or prompt=='update':
+            #comparing size first, so that md5 is computed only when needed
+            if files_list[match].get('fileSize') == str(os.path.getsize(curr_file_path)) and \
+               files_list[match].get('md5Checksum') == get_md5(curr_file_path, md5s=md5s):
+                print(message + 'unchanged, skipped')
+                return None
+            
+            file = resumable_upload(drive, curr_file_path, drive_folder_id, file_name, file_id=files_list[match]['id'], chunk_size=chunk_size)
+            index_add(default_root, drive_folder_id, file)
+            print(message + 'Updated')
+            return None
         
         if prompt=='ask':
+            print(message, end='')
+            message = ''
             prompt = input("Press 's' to skip / 'o' to overwrite / 'c' to create copy ('as'/'ao'/'ac' to repeat action for rest) : ")
             
             while not(prompt=='s' or prompt=='o' or prompt == 'c' or prompt=='as' or prompt=='ao' or prompt == 'ac'):
                 prompt = input("Select 's' or 'o' or c: ")
                 
         if prompt=='o' or prompt == 'ao' or prompt=='overwrite':
-            file['id'] = files_list[match]['id']
-            file.Upload(param={'supportsAllDrives' : True})
-            print('Overwritten')
+            file = resumable_upload(drive, curr_file_path, drive_folder_id, file_name, file_id=files_list[match]['id'], chunk_size=chunk_size)
+            index_add(default_root, drive_folder_id, file)
+            print(message + 'Overwritten')
             
         elif prompt=='s' or prompt == 'as' or prompt=='skip':
-            print('skipped')
+            print(message + 'skipped')
             
         if prompt=='copy' or prompt=='c' or prompt == 'ac':
             j = 0
@@ -947,22 +1778,136 @@ def upload_file_by_id(curr_file_path, drive_folder_id, drive, prompt='ask', file
                 j+=1
                 new_file_name = '.'.join(file_name_split[:-1]) + '({}).'.format(j) + file_name_split[-1]
             
-            file['title'] = new_file_name
-            file.Upload(param={'supportsAllDrives' : True})
-            print('copy_created')
+            file = resumable_upload(drive, curr_file_path, drive_folder_id, new_file_name, chunk_size=chunk_size)
+            add_cached_child(default_root, drive_folder_id, new_file_name, file['id'], file['mimeType'])
+            index_add(default_root, drive_folder_id, file)
+            print(message + 'copy_created')
             
-        
-    except:
-        file.Upload(param={'supportsAllDrives' : True})
-        print('Done!')
-        
     if len(prompt)>1:
         return prompt[-1]
     else:
         return None
 
+
+def upload_concurrently(curr_path, curr_folder_name, paths_list, drive_parent_folder_path, drive, prompt='skip', default_root=DEFAULT_ROOT, jobs=4, chunk_size=UPLOAD_CHUNK_SIZE, md5s=None):
+    """
+    Uploads the listed contents of the folder at curr_path using a pool of threads.
+    All the drive folders are created before the uploads start, with one listing
+    and one batch request for the folders at each depth. 
+    Used by upload() when jobs > 1.
+    
+    Parameters
+    -----------------
+    curr_path : string
+        path to folder or file on current system
+    curr_folder_name : string
+        name of the folder being uploaded ('' if a single file is uploaded)
+    paths_list : list
+        relative paths of the folder contents, as returned by list_all_contents()
+    drive_parent_folder_path : string
+        path to drive folder into which upload will be done
+    drive : pydrive.GoogleDrive() object
+    prompt : string (optional)
+        'skip', 'overwrite', 'copy' or 'update' (or 's', 'o', 'c', 'u') if file already exists.
+        'ask' is considered as 'skip', since users can't be prompted by the threads.
+    default_root : string (optional)
+        id of the drive
+    jobs : int (optional)
+        number of files uploaded concurrently
+    chunk_size : int (optional)
+        bytes sent per request (UPLOAD_CHUNK_SIZE by default)
+    
+    Returns
+    -----------------
+    None
+        Uploads the files and prints the throughput
+    
+    """
+    if prompt == 'ask':
+        print("Cannot prompt during concurrent uploads : existing files will be skipped. Use '-o' or '-c' to overwrite or copy.")
+        prompt = 's'
+    
+    #drive folder into which the contents are uploaded
+    if curr_folder_name == '':
+        base_path = drive_parent_folder_path
+    elif drive_parent_folder_path == '':
+        base_path = curr_folder_name
+    else:
+        base_path = drive_parent_folder_path + '/' + curr_folder_name
+    
+    base_id = (get_path_ids(base_path, drive, create_missing_folders = True, path_to = 'folder', default_root=default_root))[-1]
+    
+    #relative paths of all the folders required, by their depth
+    levels = {}
+    upload_list = []
+    
+    for path_i in paths_list:
+        
+        if curr_folder_name == '':
+            #uploading single file
+            local_path = curr_path
+        else:
+            local_path = curr_path + path_i
+        
+        path_list = [name for name in re.split('[\\\\/]', path_i) if name != '']
+        
+        if not os.path.isdir(local_path):
+            path_list = path_list[:-1]
+            upload_list.append((local_path, '/'.join(path_list)))
+        
+        for depth in range(1, len(path_list) + 1):
+            levels.setdefault(depth, set()).add('/'.join(path_list[:depth]))
+    
+    #creating drive folders first : one listing and one batch request of new folders for each depth
+    folder_ids = {'' : base_id}
+    
+    for depth in sorted(levels):
+        folders = sorted(levels[depth])
+        parent_paths = ['/'.join(folder.split('/')[:-1]) for folder in folders]
+        children = list_children(drive, list(set([folder_ids[parent_path] for parent_path in parent_paths])), jobs=jobs)
+        missing_folders = []
+        missing_names = []
+        missing_parent_ids = []
+        
+        for folder, parent_path in zip(folders, parent_paths):
+            folder_name = folder.split('/')[-1]
+            parent_id = folder_ids[parent_path]
+            path_id = [file['id'] for file in children[parent_id] 
+                       if file['title'] == folder_name and file['mimeType'] == 'application/vnd.google-apps.folder']
+            
+            if len(path_id) > 1:
+                raise NameError('More than one folder or file found with the same name : '+ folder_name +' in ' + '/'.join([base_path, parent_path]))
+            elif len(path_id) == 1:
+                folder_ids[folder] = path_id[0]
+            else:
+                missing_folders.append(folder)
+                missing_names.append(folder_name)
+                missing_parent_ids.append(parent_id)
+        
+        for folder, folder_id in zip(missing_folders, create_folders(missing_names, missing_parent_ids, drive, default_root=default_root)):
+            folder_ids[folder] = folder_id
+    
+    upload_list = [(local_path, folder_ids[folder], count+1) for count, (local_path, folder) in enumerate(upload_list)]
+    
+    total_count = len(upload_list)
+    
+    def upload_job(job):
+        local_path, path_id, file_count = job
+        upload_file_by_id(local_path, path_id, drive, prompt=prompt, file_count=file_count, 
+                          total_count=total_count, default_root=default_root, chunk_size=chunk_size, md5s=md5s)
+        return os.path.getsize(local_path)
+    
+    start_time = time.time()
+    
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        total_size = sum(executor.map(upload_job, upload_list))
+    
+    time_taken = max(time.time() - start_time, 1e-6)
+    print("Processed {} kB in {} s ({} kB/s) with {} jobs".format(round(total_size/1000, 2), round(time_taken, 2),
+                                                                 round(total_size/1000/time_taken, 2), jobs))
+
         
-def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_root=DEFAULT_ROOT):
+def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_root=DEFAULT_ROOT, jobs=1, chunk_size=UPLOAD_CHUNK_SIZE, md5s=None):
     
     """
     Uploads a folder/file at curr_path into the folder at drive_parent_folder_path
@@ -980,6 +1925,19 @@ def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_roo
         path to drive folder into which upload will be done
     drive : pydrive.GoogleDrive() object
     prompt : string (optional)
+    default_root : string (optional)
+        id of the drive
+    jobs : int (optional)
+        number of files uploaded concurrently.
+        
+        If more than 1, all the drive folders are created first and the files are uploaded
+        by a pool of jobs threads. Users can't be prompted, so prompt = 'ask' is considered as 'skip'.
+        With prompt = 'update', the files are first hashed by jobs processes (see get_md5_many()).
+    chunk_size : int (optional)
+        bytes sent per request (UPLOAD_CHUNK_SIZE by default)
+    md5s : dict (optional)
+        md5 checksums of local files already known, like the ones of the stage manifest :
+        {absolute file path : md5 checksum}. These files aren't hashed with prompt = 'update'.
     
 
     Notes:
@@ -993,6 +1951,8 @@ def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_roo
         'overwrite' or 'o' overwrites the file if it already exists
         
         'copy' creates an extra copy
+        
+        'update' or 'u' uploads only the files whose size or md5 checksum differ from the drive file
     
 
     Returns
@@ -1015,6 +1975,24 @@ def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_roo
         
     count = 1
     print('\n')
+    
+    if (prompt=='u' or prompt=='update') and jobs > 1:
+        #hashing all the files beforehand, so that the md5s are read from the hash cache while uploading
+        if curr_folder_name == '':
+            local_paths = [curr_path]
+        else:
+            local_paths = [curr_path + path_i for path_i in paths_list if os.path.isfile(curr_path + path_i)]
+        
+        if md5s != None:
+            local_paths = [local_path for local_path in local_paths if not os.path.abspath(local_path) in md5s]
+        get_md5_many(local_paths, jobs=jobs)
+    
+    if jobs > 1:
+        upload_concurrently(curr_path, curr_folder_name, paths_list, drive_parent_folder_path, drive,
+                            prompt=prompt, default_root=default_root, jobs=jobs, chunk_size=chunk_size, md5s=md5s)
+        print('Done!')
+        return
+    
     prompt_chg = None
     
     for path_i in paths_list:
@@ -1029,9 +2007,9 @@ def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_roo
             drive_path = drive_parent_folder_path + '/' + curr_folder_name +  path_i
             
         if os.path.isdir(curr_path + path_i):
-            path_id = (get_path_ids(drive_path, drive, create_missing_folders = True, path_to = 'folder'))[-1]
+            path_id = (get_path_ids(drive_path, drive, create_missing_folders = True, path_to = 'folder', default_root=default_root))[-1]
         else:
-            path_id_list = get_path_ids(drive_path, drive, create_missing_folders = True, path_to = 'not-folder')
+            path_id_list = get_path_ids(drive_path, drive, create_missing_folders = True, path_to = 'not-folder', default_root=default_root)
             if len(path_id_list) == 1:
                 path_id = default_root
             else:
@@ -1039,17 +2017,152 @@ def upload(curr_path, drive_parent_folder_path, drive, prompt='ask', default_roo
             
             if curr_folder_name == '':
                 #uploading single file
-                prompt_chg = upload_file_by_id(curr_path, path_id, drive, file_count=count, total_count=total_count, prompt=prompt)
+                prompt_chg = upload_file_by_id(curr_path, path_id, drive, file_count=count, total_count=total_count, prompt=prompt, default_root=default_root, chunk_size=chunk_size, md5s=md5s)
             else:
                 #uploading file in a folder
-                prompt_chg = upload_file_by_id(curr_path + path_i, path_id, drive, file_count=count, total_count=total_count, prompt=prompt)
+                prompt_chg = upload_file_by_id(curr_path + path_i, path_id, drive, file_count=count, total_count=total_count, prompt=prompt, default_root=default_root, chunk_size=chunk_size, md5s=md5s)
             
             count += 1
         
     print('Done!')
 
     
-def download_file_by_id(file_id, download_path, drive, prompt='ask',file_count=1, total_count=1):
+def download_chunk(http, uri, headers, start, chunk_size):
+    """
+    Downloads upto chunk_size bytes of a drive file from the byte start, with a Range request.
+    
+    Parameters
+    ----------------
+    http : httplib2.Http() object
+    uri : string
+        uri of the file's content, like the uri of a files().get_media() request
+    headers : dict
+        headers of the request, to which the Range header is added
+    start : int
+        first byte downloaded
+    chunk_size : int
+        no. of bytes requested
+    
+    Returns
+    ----------------
+    content and size : tuple
+        (bytes received, total size of the file)
+    
+    Notes
+    ----------------
+    Raises HttpError if the request fails.
+    """
+    from googleapiclient.errors import HttpError
+    
+    headers = dict(headers)
+    headers['range'] = 'bytes={}-{}'.format(start, start + chunk_size - 1)
+    resp, content = http.request(uri, method='GET', headers=headers)
+    status = int(resp.status)
+    
+    if status == 206:
+        #'Content-Range: bytes <first>-<last>/<total size>'
+        return content, int(resp['content-range'].split('/')[-1])
+    
+    if status == 200:
+        #the whole file is sent when the range isn't supported
+        return content[start:], len(content)
+    
+    if status == 416 and resp.get('content-range') == 'bytes */0':
+        #empty files have no bytes to request
+        return b'', 0
+    
+    raise HttpError(resp, content, uri=uri)
+
+
+def stream_download(drive, file_id, file_path, chunk_size=DOWNLOAD_CHUNK_SIZE, file_size=None, md5=None):
+    """
+    Downloads the content of a file in drive into file_path in chunks.
+    Each chunk is written to the disk as soon as it is received, so the memory used
+    doesn't depend on the size of the file.
+    
+    The content is written to file_path + PART_EXT, with the file's id, size and md5 recorded
+    next to it in file_path + PART_EXT + '.json'. If a download is interrupted, the next download of the
+    same file continues from the last byte of the .part file. Once complete, the md5 is verified
+    and the .part file is renamed to file_path.
+    
+    Parameters
+    ----------------
+    drive : pydrive.GoogleDrive() object
+    file_id : string
+        file's id in drive
+    file_path : string
+        path of the file to be written on current system
+    chunk_size : int (optional)
+        bytes downloaded per request (DOWNLOAD_CHUNK_SIZE by default)
+    file_size : int or string (optional)
+        size of the file in drive ('fileSize'). Downloads are resumed only if this is known.
+    md5 : string (optional)
+        md5 checksum of the file in drive ('md5Checksum'). The download is verified only if this is known.
+    
+    Returns
+    ----------------
+    None
+        Just downloads the file
+    
+    """
+    part_path = file_path + PART_EXT
+    part_info_path = part_path + '.json'
+    part_info = {'id' : file_id, 'size' : file_size, 'md5' : md5}
+    
+    if file_size != None:
+        file_size = int(file_size)
+    
+    start = 0
+    if file_size != None and os.path.exists(part_path) and os.path.exists(part_info_path):
+        try:
+            with open(part_info_path, 'r') as file:
+                old_part_info = json.load(file)
+        except:
+            old_part_info = None
+        
+        if old_part_info == part_info and os.path.getsize(part_path) <= file_size:
+            start = os.path.getsize(part_path)
+    
+    if start == 0:
+        with open(part_info_path, 'w') as file:
+            json.dump(part_info, file)
+    
+    #the whole file may have been received before the interruption
+    if start == 0 or start < file_size:
+        request = drive.auth.service.files().get_media(fileId=file_id, supportsAllDrives=True)
+        http = get_http(drive)
+        total_size = None
+        
+        with open(part_path, 'ab' if start > 0 else 'wb') as file:
+            #Range requests begin from the last byte received
+            while total_size == None or start < total_size:
+                content, total_size = call_with_retry(download_chunk, http, request.uri, request.headers, start, chunk_size)
+                
+                if len(content) == 0:
+                    break
+                
+                file.write(content)
+                start += len(content)
+    
+    if md5 != None and file_md5(part_path) != md5:
+        os.remove(part_path)
+        os.remove(part_info_path)
+        
+        if start > 0:
+            #the resumed .part file was corrupt : downloading from the beginning
+            return stream_download(drive, file_id, file_path, chunk_size=chunk_size, file_size=file_size, md5=md5)
+        
+        raise ValueError("md5 checksum of the downloaded file doesn't match the drive file : " + file_path)
+    
+    os.replace(part_path, file_path)
+    os.remove(part_info_path)
+    
+    if md5 != None:
+        #the checked md5 is cached, so that the file isn't hashed again when compared with drive
+        cache_md5(file_path, md5)
+
+
+def download_file_by_id(file_id, download_path, drive, prompt='ask',file_count=1, total_count=1, file_metadata=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
     """
     Downloads a file at drive_path into the folder at download_path
     if file_id is known
@@ -1070,6 +2183,11 @@ def download_file_by_id(file_id, download_path, drive, prompt='ask',file_count=1
         1 (default) to print the file's count when downloading folder
     total_count : int (optional)
         1 (default) to print the total files in a folder when downloading        
+    file_metadata : dict (optional)
+        metadata of the file if already listed (like the records from list_all_contents).
+        If None, the metadata is fetched.
+    chunk_size : int (optional)
+        bytes downloaded per request (DOWNLOAD_CHUNK_SIZE by default)
     
 
     Notes:
@@ -1094,17 +2212,26 @@ def download_file_by_id(file_id, download_path, drive, prompt='ask',file_count=1
     
     """
     file = drive.CreateFile({ 'id' : file_id })
-    fetchMetadata(file)
+    
+    if file_metadata == None:
+        fetchMetadata(file, fields=FIELDS['record'])
+    else:
+        file.uploaded = True
+        file.UpdateMetadata(file_metadata)
+    
     file_name = file['title']
     file_size = round(float(file['quotaBytesUsed'])/1000, 2)
-    print("Download {}/{} ".format(file_count,total_count) + file_name + ' ({} kB) : '.format(file_size), end='')
+    #message is printed in one go, so that lines from concurrent downloads don't mix
+    message = "Download {}/{} ".format(file_count,total_count) + file_name + ' ({} kB) : '.format(file_size)
     
     new_file_path = download_path + '\\'+ file_name
     if os.path.exists(new_file_path):
         fsize = round(os.path.getsize(new_file_path)/1000, 2)
-        print(' already ({} kB) exists :\n'.format(fsize), end='')
+        message += ' already ({} kB) exists :\n'.format(fsize)
         
         if prompt=='ask':
+            print(message, end='')
+            message = ''
             prompt = input("Press 's' to skip / 'o' to overwrite / 'c' to create copy ('as'/'ao'/'ac' to repeat action for rest) : ")
             
             while not(prompt=='s' or prompt=='o' or prompt=='c' or prompt=='as' or prompt=='ao' or prompt=='ac'):
@@ -1120,21 +2247,21 @@ def download_file_by_id(file_id, download_path, drive, prompt='ask',file_count=1
                 new_file_name = '.'.join(file_name_split[:-1]) + '({}).'.format(j) + file_name_split[-1]
                 new_file_path = download_path + '\\' + new_file_name
             
-            print('copy_create')
+            print(message + 'copy_create')
+            stream_download(drive, file_id, new_file_path, chunk_size=chunk_size, file_size=file.get('fileSize'), md5=file.get('md5Checksum'))
         
         elif prompt=='skip' or prompt=='s' or prompt=='as':
-            print('skip')
+            print(message + 'skip')
         
         elif prompt=='overwrite' or prompt=='o'or prompt=='ao':
-            print('overwrite')
-            os.remove(download_path + '\\'+ file_name)
-            
-        file.GetContentFile(new_file_path)
+            print(message + 'overwrite')
+            #the old file is replaced once the new one is downloaded
+            stream_download(drive, file_id, new_file_path, chunk_size=chunk_size, file_size=file.get('fileSize'), md5=file.get('md5Checksum'))
     
     else:
         create_folders_path(download_path)
-        file.GetContentFile(new_file_path)
-        print('')
+        stream_download(drive, file_id, new_file_path, chunk_size=chunk_size, file_size=file.get('fileSize'), md5=file.get('md5Checksum'))
+        print(message)
     
     if len(prompt)>1:
         return prompt[-1]
@@ -1142,7 +2269,144 @@ def download_file_by_id(file_id, download_path, drive, prompt='ask',file_count=1
         return None
 
     
-def download(drive, drive_path=None, drive_path_id=None, download_path=os.getcwd(), prompt='ask', default_root=DEFAULT_ROOT):
+def download_concurrently(drive, drive_path, paths_list, ids_list, records_list, download_path, prompt='skip', jobs=4, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Downloads the listed contents of the drive folder at drive_path using a pool of threads.
+    All the local folders are created before the downloads start. 
+    Used by download() when jobs > 1.
+    
+    Parameters
+    -----------------
+    drive : pydrive.GoogleDrive() object
+    drive_path : string
+        path of the folder on drive
+    paths_list, ids_list, records_list : lists
+        relative paths, ids and metadata of the folder contents, as returned by list_all_contents()
+    download_path : string
+        path to folder into which download will be done
+    prompt : string (optional)
+        'skip', 'overwrite' or 'copy' (or 's', 'o', 'c') if file already exists.
+        'ask' is considered as 'skip', since users can't be prompted by the threads.
+    jobs : int (optional)
+        number of files downloaded concurrently
+    chunk_size : int (optional)
+        bytes downloaded per request (DOWNLOAD_CHUNK_SIZE by default)
+    
+    Returns
+    -----------------
+    None
+        Downloads the files and prints the throughput
+    
+    """
+    if prompt == 'ask':
+        print("Cannot prompt during concurrent downloads : existing files will be skipped. Use '-o' or '-c' to overwrite or copy.")
+        prompt = 's'
+    
+    total_count = len(paths_list)
+    #{(folder path, file name without copy numbers) : downloads}
+    download_groups = {}
+    
+    #creating local folders first
+    for count, (path_i, id_i, file) in enumerate(zip(paths_list, ids_list, records_list)):
+        path_i = '\\' + re.split('[\\\\/]', drive_path)[-1] + path_i
+        
+        if file['mimeType'] == 'application/vnd.google-apps.folder':
+            create_folders_path(download_path + path_i)
+        else:
+            folder_path = download_path + '\\'.join(re.split('[\\\\/]', path_i)[:-1])
+            create_folders_path(folder_path)
+            #files with the same title, or whose copies ('name(0).ext') may take each other's names, are
+            #downloaded one after another by the same thread, so that they never write the same local file
+            key = (folder_path, re.sub(r'\(\d+\)', '', file['title']).lower())
+            download_groups.setdefault(key, []).append((id_i, folder_path, count+1, file))
+    
+    def download_job(jobs_group):
+        group_size = 0
+        
+        for file_id, folder_path, file_count, file in jobs_group:
+            #skipped files are not counted in the throughput
+            skipped = prompt in ('s', 'as', 'skip') and os.path.exists(folder_path + '\\' + file['title'])
+            download_file_by_id(file_id, folder_path, drive, prompt=prompt, file_count=file_count, 
+                                total_count=total_count, file_metadata=file, chunk_size=chunk_size)
+            
+            if not skipped:
+                group_size += float(file.get('fileSize', 0))
+        
+        return group_size
+    
+    start_time = time.time()
+    
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        total_size = sum(executor.map(download_job, download_groups.values()))
+    
+    time_taken = max(time.time() - start_time, 1e-6)
+    print("Downloaded {} kB in {} s ({} kB/s) with {} jobs".format(round(total_size/1000, 2), round(time_taken, 2),
+                                                                  round(total_size/1000/time_taken, 2), jobs))
+
+
+def sync_entry(local_path, file):
+    """
+    Returns the manifest entry of a local file synced with a drive file.
+    
+    Parameters
+    -----------------
+    local_path : string
+        path of the file on current system
+    file : dict
+        metadata of the drive file (FIELDS['record'])
+    
+    Returns
+    -----------------
+    entry : dict
+        {'id' : drive file id, 'remote' : [md5Checksum, fileSize, modifiedDate], 'local' : [size, mtime in ns]}
+    
+    """
+    stat = os.stat(local_path)
+    
+    return {'id' : file['id'], 
+            'remote' : [file.get('md5Checksum'), file.get('fileSize'), file.get('modifiedDate')], 
+            'local' : [stat.st_size, stat.st_mtime_ns]}
+
+
+def is_changed(local_path, file, manifest):
+    """
+    Checks if a local file differs from the drive file.
+    
+    If the manifest entry of the file shows that neither the drive file nor the local file changed since
+    they were last synced, the file is unchanged. Otherwise, the size and md5 checksum are compared.
+    
+    Parameters
+    -----------------
+    local_path : string
+        path of the file on current system
+    file : dict
+        metadata of the drive file (FIELDS['record'])
+    manifest : dict
+        {absolute local path : entry returned by sync_entry()}
+    
+    Returns
+    -----------------
+    changed or not : bool
+        True if the local file doesn't exist or differs from the drive file
+    
+    """
+    if not os.path.exists(local_path):
+        return True
+    
+    old_entry = manifest.get(os.path.abspath(local_path))
+    entry = sync_entry(local_path, file)
+    
+    if old_entry != None and old_entry['remote'] == entry['remote'] and old_entry['local'] == entry['local']:
+        return False
+    
+    if file.get('md5Checksum') == None:
+        #files like google docs have no content to compare
+        return old_entry == None or old_entry['remote'] != entry['remote']
+    
+    return str(entry['local'][0]) != file.get('fileSize') or get_md5(local_path) != file['md5Checksum']
+
+
+def download(drive, drive_path=None, drive_path_id=None, download_path=os.getcwd(), prompt='ask', default_root=DEFAULT_ROOT, jobs=1, chunk_size=DOWNLOAD_CHUNK_SIZE, manifest=None):
     """
     Downloads a file or folder at drive_path into the folder at download_path
     Either id or path - one of them is sufficient
@@ -1170,6 +2434,20 @@ def download(drive, drive_path=None, drive_path_id=None, download_path=os.getcwd
     
     prompt : string (optional)
     
+    default_root : string (optional)
+        id of the drive
+    
+    jobs : int (optional)
+        number of drive folders listed concurrently and number of files downloaded concurrently.
+        
+        If more than 1, the local folders are created first and the files are downloaded
+        by a pool of jobs threads. Users can't be prompted, so prompt = 'ask' is considered as 'skip'.
+    chunk_size : int (optional)
+        bytes downloaded per request (DOWNLOAD_CHUNK_SIZE by default)
+    manifest : dict (optional)
+        If passed, only new and changed files (see is_changed()) are downloaded, overwriting the local files, 
+        and prompt is ignored. The manifest is updated with the entries of all the synced files.
+    
 
     Notes:
     ------------
@@ -1193,40 +2471,76 @@ def download(drive, drive_path=None, drive_path_id=None, download_path=os.getcwd
     print("Fetching ids_list : ",end='')
     
     if drive_path==None and drive_path_id != None:
-        drive_path, _ = get_path_from_id(drive, drive_path_id)
+        drive_path, _ = get_path_from_id(drive, drive_path_id, default_root=default_root)
     
-    paths_list, ids_list, total_count = list_all_contents(drive_path, drive_path_id, drive=drive, dynamic_show=False, tier = 'all', default_root=default_root)
+    paths_list, ids_list, records_list, total_count = list_all_contents(drive_path, drive_path_id, drive=drive, dynamic_show=False, tier = 'all', 
+                                                                        default_root=default_root, jobs=jobs, get_records=True)
     
     count = 1
     print("{} paths found ...".format(total_count))
     
-    #if drive_path leads to a file
-    if len(paths_list)==1 and not (paths_list[0][0] == '\\' and paths_list[0][0] == '/'):
-        prompt_chg = download_file_by_id(ids_list[0], download_path, drive, prompt=prompt)
-        print("Done!\n------------\n")
-        return 
+    is_file = len(paths_list)==1 and not (paths_list[0][0] == '\\' and paths_list[0][0] == '/')
     
-    prompt_chg = None
-    #if drive_path leads to folder
-    for path_i, id_i in zip(paths_list, ids_list):
+    if manifest != None:
+        #local paths of the files
+        if is_file:
+            local_paths = [download_path + '\\' + records_list[0]['title']]
+        else:
+            local_paths = [download_path + '\\'.join(re.split('[\\\\/]', '\\' + re.split('[\\\\/]', drive_path)[-1] + path_i)) 
+                           for path_i in paths_list]
         
-        #change in prompt based on user input
-        if prompt_chg:
-            prompt = prompt_chg
+        synced_list = [(local_path, file) for local_path, file in zip(local_paths, records_list) 
+                       if file['mimeType'] != 'application/vnd.google-apps.folder']
+        keep_list = [file['mimeType'] == 'application/vnd.google-apps.folder' or is_changed(local_path, file, manifest) 
+                     for local_path, file in zip(local_paths, records_list)]
         
-        path_i = '\\' + re.split('[\\\\/]', drive_path)[-1] + path_i
+        print("{} files unchanged.".format(keep_list.count(False)))
+        paths_list = [path_i for path_i, keep in zip(paths_list, keep_list) if keep]
+        ids_list = [id_i for id_i, keep in zip(ids_list, keep_list) if keep]
+        records_list = [file for file, keep in zip(records_list, keep_list) if keep]
+        total_count = len(paths_list)
+        prompt = 'o'
         
-        file = drive.CreateFile({'id' : id_i})
-        fetchMetadata(file)
-        if file['mimeType'] == 'application/vnd.google-apps.folder':
-            create_folders_path(download_path + path_i)
-            count+=1
-        else:
-            folder_path = '\\'.join(re.split('[\\\\/]', path_i)[:-1])
-            prompt_chg = download_file_by_id(id_i, download_path + folder_path, drive, prompt=prompt, file_count=count, total_count=total_count)
-            count+=1
+        if len(paths_list) == 0:
+            print("Done!")
+            return
+    
+    #if drive_path leads to a file
+    if is_file:
+        prompt_chg = download_file_by_id(ids_list[0], download_path, drive, prompt=prompt, file_metadata=records_list[0], chunk_size=chunk_size)
+    
+    elif jobs > 1:
+        download_concurrently(drive, drive_path, paths_list, ids_list, records_list, download_path, prompt=prompt, jobs=jobs, chunk_size=chunk_size)
+    
+    else:
+        prompt_chg = None
+        #if drive_path leads to folder
+        for path_i, id_i, file in zip(paths_list, ids_list, records_list):
+            
+            #change in prompt based on user input
+            if prompt_chg:
+                prompt = prompt_chg
+            
+            path_i = '\\' + re.split('[\\\\/]', drive_path)[-1] + path_i
+            
+            if file['mimeType'] == 'application/vnd.google-apps.folder':
+                create_folders_path(download_path + path_i)
+                count+=1
+            else:
+                folder_path = '\\'.join(re.split('[\\\\/]', path_i)[:-1])
+                prompt_chg = download_file_by_id(id_i, download_path + folder_path, drive, prompt=prompt, file_count=count, total_count=total_count, file_metadata=file, chunk_size=chunk_size)
+                count+=1
+    
+    if manifest != None:
+        for local_path, file in synced_list:
+            if os.path.exists(local_path):
+                manifest[os.path.abspath(local_path)] = sync_entry(local_path, file)
+    
+    if is_file:
+        print("Done!\n------------\n")
+    else:
+        print("Done!")
     
-    print("Done!")
     
 
 def delete(drive, drive_path=None, drive_path_id=None, relative_id=None, hard_delete=False, default_root=DEFAULT_ROOT):
@@ -1268,19 +2582,16 @@ def delete(drive, drive_path=None, drive_path_id=None, relative_id=None, hard_de
     """
     if drive_path_id==None and drive_path != None:
         try:
-            drive_path_id = get_path_ids(drive_path, drive, create_missing_folders = False, relative_id = relative_id, path_to = 'folder', default_root=DEFAULT_ROOT)[-1]
+            drive_path_id = get_path_ids(drive_path, drive, create_missing_folders = False, relative_id = relative_id, path_to = 'folder', default_root=default_root)[-1]
         except:
-            drive_path_id = get_path_ids(drive_path, drive, create_missing_folders = False, relative_id = relative_id, path_to = 'not-folder', default_root=DEFAULT_ROOT)[-1]
+            drive_path_id = get_path_ids(drive_path, drive, create_missing_folders = False, relative_id = relative_id, path_to = 'not-folder', default_root=default_root)[-1]
     
     if drive_path_id == 'no-file-found':
         print("The file doesn't exists.")
         return
     
-    file = drive.CreateFile({'id' : drive_path_id})
-    fetchMetadata(file)
+    error = delete_many(drive, [drive_path_id], hard_delete=hard_delete, default_root=default_root)[0]
     
-    if hard_delete:
-        file.Delete(param={'supportsAllDrives' : True})
-    else:
-        file.Trash(param={'supportsAllDrives' : True})
+    if error != None:
+        raise error
         
@@ -1,41 +1,79 @@
 #!/usr/bin/env python
 
-import argparse
 import os
+import sys
+
+# When the gd daemon is running, the command is forwarded to it before the modules for drive
+# are imported, so that the gd command does only the work of a thin client
+if __name__ == "__main__":
+    from paths import *
+    from daemon_util import *
+
+    if len(sys.argv) > 1 and sys.argv[1] != 'daemon' and not sys.argv[1].startswith('-') and not os.environ.get(NO_DAEMON_ENV):
+        exit_status = forward_command(os.getcwd(), sys.argv[1], sys.argv[2:])
+
+        if exit_status != None:
+            sys.exit(exit_status)
+
+import argparse
 import json
 import re
 import shutil
+import time
 
-from pydrive.auth import GoogleAuth
-from pydrive.drive import GoogleDrive
-
-if __name__ == "__main__":
+# gd.py is imported again as '__mp_main__' by the processes spawned by get_md5_many() (on Windows and macOS)
+if __name__ in ("__main__", "__mp_main__"):
     from paths import *
     from auth_util import *
     from drive_util import *
+    from cache_util import *
+    from index_util import *
+    from hash_util import *
+    from daemon_util import *
 else:
     from .paths import *
     from .auth_util import *
     from .drive_util import *
-
-# Important objects for gdrive2
-gauth = GoogleAuth()  # for authentication
-drive = GoogleDrive(gauth)  # for drive utilities
+    from .cache_util import *
+    from .index_util import *
+    from .hash_util import *
+    from .daemon_util import *
+
+# Important objects for gdrive2, created by get_gauth() and authenticate() when a command needs drive.
+# PyDrive and googleapiclient are imported only then, so that commands like 'gd help' start quickly.
+gauth = None  # for authentication (never one of the auth objects of _SESSIONS)
+drive = None  # for drive utilities
+# drive objects authenticated before : {(user_name, client) : drive}, reused while their tokens are valid
+_SESSIONS = {}
 
 # set to True when importing gd.py
 RETURN_RESULT = False
 
-# Current Working Directory
-CURR_PATH = os.getcwd()
 # Local Home directory
 CURR_HOME_DIR = '/'.join(re.split('[\\\\/]', os.path.expanduser('~')))
-# Main Home directory
-HOME_DIR = re.split("[\\\\/]", CURR_PATH)[0]
 
-# Info paths in current directory
-INFO_FOLDER = os.path.join(CURR_PATH, '.gd')
-INFO_PATH = os.path.join(INFO_FOLDER, '.gdinfo.json')
-STAGE_PATH = os.path.join(INFO_FOLDER, '.gdstage')
+
+def set_curr_path(curr_path):
+    """Sets the current working directory and the info paths in it, used by all the commands"""
+
+    global CURR_PATH, HOME_DIR, INFO_FOLDER, INFO_PATH, STAGE_PATH, CACHE_PATH
+
+    # Current Working Directory
+    CURR_PATH = curr_path
+    # Main Home directory
+    HOME_DIR = re.split("[\\\\/]", CURR_PATH)[0]
+
+    # Info paths in current directory
+    INFO_FOLDER = os.path.join(CURR_PATH, '.gd')
+    INFO_PATH = os.path.join(INFO_FOLDER, '.gdinfo.json')
+    STAGE_PATH = os.path.join(INFO_FOLDER, '.gdstage')
+    CACHE_PATH = os.path.join(INFO_FOLDER, CACHE_FOLDER)
+
+    # Drive metadata is cached in the .gd folder
+    set_cache_dir(CACHE_PATH)
+
+
+set_curr_path(os.getcwd())
 
 # Text to show for 'gd -help'
 help_text = "\n\
@@ -53,6 +91,8 @@ Overview of initializing/listing fucnctions:\n\
 'cd'     : changes parent_path directly without using 'reset' function\n\
 'mkdir'  : creates new folder in the parent or path provided\n\
 'rm'     : creates existing folder/file in the parent or path provided\n\
+'cache'  : clears the cached drive paths and ids\n\
+'index'  : builds, refreshes or clears the local mirror of a parent's drive folder\n\
 \n\
 Overview of push/pull functions:\n\
 ---------------------------------\n\
@@ -65,10 +105,15 @@ Miscelleneous functions:\n\
 'help'   : Shows the list of functions or commands available\n\
 'default' : Brings the package to its default state (removes all clients and auth. data)\n\
 'version' : Prints the current version\n\
+'daemon'  : Starts or stops the gd daemon, which runs gd commands in one long-lived process\n\
 \n\
 Use '-h' / -h  or '-help' / -help to see help about a function/command.\n\
 Example: gdrive2.init(['-h']) / gd init -h\n"
 
+# Commands run by 'gd <func>'. Other functions of gd.py (and the ones imported into it) aren't commands.
+COMMANDS = ('init', 'status', 'reset', 'ls', 'find', 'cd', 'mkdir', 'rm', 'cache', 'index',
+            'add', 'push', 'pull', 'help', 'default', 'version', 'daemon')
+
 # ---------------------------------------------------------------------------------------
 # UTILITY-FUNCTIONS
 # These are used in main command functions
@@ -136,6 +181,95 @@ def check_user_name(user_name=None):
 # -----------------------------------------
 
 
+def get_gauth():
+    """Returns the GoogleAuth object, creating it when first needed"""
+
+    global gauth
+
+    if gauth == None:
+        from pydrive.auth import GoogleAuth
+        gauth = GoogleAuth()
+
+    return gauth
+
+# -----------------------------------------
+
+
+def authenticate(user_name, client):
+    """
+    Authenticates the username with the client and returns the drive object.
+    The drive object is reused by later commands of the same process (like in the gd daemon)
+    until its access token expires.
+    """
+
+    global drive
+    from pydrive.auth import GoogleAuth
+    from pydrive.drive import GoogleDrive
+
+    key = (user_name, client)
+
+    if key in _SESSIONS and not _SESSIONS[key].auth.access_token_expired:
+        drive = _SESSIONS[key]
+
+    else:
+        if key in _SESSIONS:
+            auth = _SESSIONS[key].auth
+        else:
+            auth = GoogleAuth()
+
+        auth_from_cred(auth, user_name, client)
+        drive = GoogleDrive(auth)
+        _SESSIONS[key] = drive
+
+    set_cache_user(user_name)
+
+    return drive
+
+# -----------------------------------------
+
+
+def get_jobs(args):
+    """Removes '-j <N>' or '--jobs <N>' from args and returns N (1 if not passed)"""
+
+    jobs = 1
+
+    for flag in ['-j', '--jobs']:
+        if flag in args:
+            idx = args.index(flag)
+            try:
+                jobs = int(args[idx+1])
+                _ = args.pop(idx+1)
+            except:
+                print("No. of jobs expected after '" + flag + "'. Using 1 job.")
+
+            _ = args.pop(idx)
+
+    return max(jobs, 1)
+
+# -----------------------------------------
+
+
+def get_chunk_size(args):
+    """Removes '--chunk-size <MB>' from args and returns the chunk size in bytes (UPLOAD_CHUNK_SIZE if not passed)"""
+
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    if '--chunk-size' in args:
+        idx = args.index('--chunk-size')
+        try:
+            #chunks must be multiples of 256 kB
+            chunk_size = max(int(float(args[idx+1])*4), 1)*256*1024
+            _ = args.pop(idx+1)
+        except:
+            print("Chunk size in MB expected after '--chunk-size'. Using {} MB.".format(UPLOAD_CHUNK_SIZE//(1024*1024)))
+
+        _ = args.pop(idx)
+
+    return chunk_size
+
+# -----------------------------------------
+
+
 def check_info():
     """Checks if the info file exists in current working directory"""
 
@@ -150,6 +284,14 @@ def check_info():
 # ------------------------------------------
 
 
+def get_parents_list(info):
+    """Returns the list of parent names in info (all the keys except 'default_parent' and PAGE_TOKENS)"""
+
+    return [key for key in info.keys() if not key in ['default_parent', PAGE_TOKENS]]
+
+# ------------------------------------------
+
+
 def create_info(info, parent_path=DEFAULT_INFO[DEFAULT_INFO['default_parent']][1],
                 parent_name=DEFAULT_INFO['default_parent'],
                 drive_name=DEFAULT_INFO[DEFAULT_INFO['default_parent']][3],
@@ -178,8 +320,7 @@ def create_info(info, parent_path=DEFAULT_INFO[DEFAULT_INFO['default_parent']][1
     if not same_user:
         info[parent_name][0], _ = check_user_name()
 
-    auth_from_cred(gauth, info[parent_name][0], info[parent_name][5])
-    drive = GoogleDrive(gauth)
+    drive = authenticate(info[parent_name][0], info[parent_name][5])
     info[parent_name][2] = get_path_ids(
         parent_path, drive, create_missing_folders=False, path_to='folder', default_root=drive_id)[-1]
 
@@ -195,8 +336,7 @@ def check_parent_name():
     with open(INFO_PATH, 'r') as file:
         info = json.load(file)
 
-    parent_list = list(info.keys())
-    parent_list.remove('default_parent')
+    parent_list = get_parents_list(info)
 
     par = input('Enter new parent name : ')
 
@@ -213,7 +353,7 @@ def check_parent_name():
             par = input('This name already exists. Enter another :')
             prob = True
 
-        if par == 'default_parent':
+        if par == 'default_parent' or par == PAGE_TOKENS:
             par = input('This name is not allowed. Try another:')
             prob = True
 
@@ -372,7 +512,7 @@ def init(args):
         create_info(info)
 
     else:
-        auth_from_cred(gauth, info[parent_name][0], info[parent_name][5])
+        auth_from_cred(get_gauth(), info[parent_name][0], info[parent_name][5])
 
 
 # ------------------------------------------
@@ -461,8 +601,7 @@ def reset(args):
             print('gdrive2 not initialized in this folder. Try command : gd init')
             return
 
-        parents_list = list(info.keys())
-        parents_list.remove('default_parent')
+        parents_list = get_parents_list(info)
 
     if len(args) == 0:
         print("More arguements expected like these: ")
@@ -636,8 +775,8 @@ def reset(args):
                             "Use 'gd reset' to change username or delete this parent.")
                         return
 
-                    auth_from_cred(gauth, user_name, info[parent_name][5])
-                    drives_list = gauth.service.drives().list().execute()[
+                    # the session of the user, so that other sessions' credentials aren't replaced
+                    drives_list = execute_request(authenticate(user_name, info[parent_name][5]).auth.service.drives().list())[
                         'items']
                     drive_names_list = [dic['name'] for dic in drives_list]
                     drive_ids_list = [dic['id'] for dic in drives_list]
@@ -699,6 +838,7 @@ def reset(args):
                         return
                     else:
                         del info[parent_name]
+                        info.get(PAGE_TOKENS, {}).pop(parent_name, None)
                         with open(INFO_PATH, 'w') as file:
                             json.dump(info, file)
                         print(parent_name + " deleted.")
@@ -868,8 +1008,7 @@ def status(args):
         print('gd not initiated in this folder, try : gd init')
         return
 
-    parent_list = list(info.keys())
-    parent_list.remove('default_parent')
+    parent_list = get_parents_list(info)
     return_list = [info]
 
     if not '-stage' in args and not RETURN_RESULT:
@@ -1018,8 +1157,7 @@ def ls(args):
                       "'is not registered. Add a new parent using 'gd init -add' to register username.")
                 return
 
-            auth_from_cred(gauth, user_name)
-            drives_list = gauth.service.drives().list().execute()['items']
+            drives_list = execute_request(authenticate(user_name, DEFAULT_CLIENT).auth.service.drives().list())['items']
 
             if RETURN_RESULT:
                 return [[i['name'] for i in drives_list], [i['id'] for i in drives_list]]
@@ -1084,8 +1222,7 @@ def ls(args):
         print('gd not initiated in this folder, try : gd init')
         return
 
-    parents_list = list(info.keys())
-    parents_list.remove('default_parent')
+    parents_list = get_parents_list(info)
 
     if '-i' in args:
         show_ids = True
@@ -1103,8 +1240,7 @@ def ls(args):
         parent_name = info['default_parent']
         [user_name, parent_path, parent_id, drive_name,
             drive_id, client] = info[parent_name]
-        auth_from_cred(gauth, user_name, client)
-        drive = GoogleDrive(gauth)
+        drive = authenticate(user_name, client)
 
     else:
 
@@ -1124,8 +1260,7 @@ def ls(args):
 
                 [user_name, parent_path, parent_id, drive_name,
                     drive_id, client] = info[parent_name]
-                auth_from_cred(gauth, user_name, client)
-                drive = GoogleDrive(gauth)
+                drive = authenticate(user_name, client)
 
                 # ---------------DEBUGGING REQ---------------------
                 if drive_path.startswith('/'):
@@ -1149,8 +1284,7 @@ def ls(args):
                 parent_id = args[1]
 
                 [user_name, _, _, drive_name, drive_id, client] = info[parent_name]
-                auth_from_cred(gauth, user_name, client)
-                drive = GoogleDrive(gauth)
+                drive = authenticate(user_name, client)
 
         elif len(args) == 1:
             parent_name = args[0]
@@ -1160,8 +1294,7 @@ def ls(args):
             else:
                 [user_name, parent_path, parent_id, drive_name,
                     drive_id, client] = info[parent_name]
-                auth_from_cred(gauth, user_name, client)
-                drive = GoogleDrive(gauth)
+                drive = authenticate(user_name, client)
         else:
 
             print("Unexpected arguements : use 'gd ls -h' for help")
@@ -1238,8 +1371,11 @@ def find(args):
 
             '-all'  / -all  : all tiers
 
+    7. find(["<query>", '-all', '-j', '<N>'])   /   gd find "<query>" -all -j <N>
+        Lists <N> folders concurrently while searching. '--jobs' can be used in place of '-j'.
+
     Additional optional arguements:
-    -fold-path, -fold-id, -<tier>, -id, --path-search
+    -fold-path, -fold-id, -<tier>, -id, --path-search, -j / --jobs
 
 
     Examples
@@ -1263,14 +1399,14 @@ def find(args):
         print('gd not initiated in this folder, try : gd init')
         return
 
-    parents_list = list(info.keys())
-    parents_list.remove('default_parent')
+    parents_list = get_parents_list(info)
 
     search_folder_path = None
     search_folder_id = None
     tier = 'curr'
     is_id = False
     path_search = False
+    jobs = get_jobs(args)
 
     # Searching for file name with id
     if '-id' in args:
@@ -1343,8 +1479,7 @@ def find(args):
     # Authentication
     [user_name, parent_path, parent_id, drive_name,
         drive_id, client] = info[parent_name]
-    auth_from_cred(gauth, user_name, client)
-    drive = GoogleDrive(gauth)
+    drive = authenticate(user_name, client)
 
     # Looking for file with id
     if is_id:
@@ -1365,7 +1500,7 @@ def find(args):
     find_query = args[-1]
 
     query_paths = query_to_paths(drive, find_query, search_folder_path, path_id=search_folder_id,
-                                 tier=tier, path_search=path_search, default_root=drive_id)
+                                 tier=tier, path_search=path_search, default_root=drive_id, jobs=jobs)
 
     if RETURN_RESULT:
         return query_paths
@@ -1441,8 +1576,7 @@ def cd(args):
 
     [user_name, parent_path, parent_id, drive_name,
         drive_id, client] = info[parent_name]
-    auth_from_cred(gauth, user_name, client)
-    drive = GoogleDrive(gauth)
+    drive = authenticate(user_name, client)
 
     drive_path = '/'.join(re.split('[\\\\/]', drive_path))
 
@@ -1512,6 +1646,10 @@ def rm(args):
     3. rm(['<parent_name>', '<path>, '-f'])  /  gd rm <parent_name> <path> -f
         Permanently deletes files or folders in <path> in the <parent_name>
 
+    4. rm(['<parent_name>', '-id', '<id1>', '<id2>', ...])  /  gd rm <parent_name> -id <id1> <id2> ...
+        trashes (or deletes with '-f') all the files or folders with the ids, using batch requests.
+        If <parent_name> is not passed, default parent is used.
+
 
     Examples
     ----------
@@ -1519,6 +1657,8 @@ def rm(args):
 
     rm(['<parent_name>', '<path>, '-f']) /  gd rm <parent_name> <path> -f
 
+    rm(['-id', '<id1>', '<id2>'])        /  gd rm -id <id1> <id2>
+
     """
 
     if '-h' in args or '-help' in args:
@@ -1536,8 +1676,47 @@ def rm(args):
         args.remove('-f')
         hard_delete = True
 
-    parents_list = list(info.keys())
-    parents_list.remove('default_parent')
+    parents_list = get_parents_list(info)
+
+    if '-id' in args:
+        idx = args.index('-id')
+        delete_ids = args[idx+1:]
+        args = args[:idx]
+
+        if len(args) == 0:
+            parent_name = info['default_parent']
+        else:
+            parent_name = args[0]
+
+        if not parent_name in parents_list:
+            print("'" + parent_name + "' : parent name not defined before.")
+            return
+
+        [user_name, parent_path, parent_id, drive_name,
+            drive_id, client] = info[parent_name]
+
+        drive = authenticate(user_name, client)
+        prompt = 'y'
+
+        if drive_id in delete_ids or 'root' in delete_ids:
+            prompt = input(
+                "WARNING: The entire drive will be deleted. Continue?[y/n] : ")
+        elif parent_id in delete_ids:
+            prompt = input(
+                "All files in current parent will be deleted. Continue?[y/n]: ")
+
+        if prompt != 'y':
+            print("Delete action aborted.")
+            return
+
+        errors_list = delete_many(drive, delete_ids, hard_delete=hard_delete, default_root=drive_id)
+
+        for delete_id, error in zip(delete_ids, errors_list):
+            if error != None:
+                print("'" + delete_id + "' : " + str(error))
+
+        print("{}/{} deleted.".format(errors_list.count(None), len(delete_ids)))
+        return
 
     if len(args) == 2:
         parent_name = args[0]
@@ -1566,8 +1745,7 @@ def rm(args):
         print("Extra arguements passed. Try 'gd rm -h'.")
         return
 
-    auth_from_cred(gauth, user_name, client)
-    drive = GoogleDrive(gauth)
+    drive = authenticate(user_name, client)
     prompt = 'y'
 
     # ---------------DEBUGGING REQ---------------------
@@ -1655,8 +1833,7 @@ def mkdir(args):
         print('gd not initiated in this folder, try : gd init')
         return
 
-    parents_list = list(info.keys())
-    parents_list.remove('default_parent')
+    parents_list = get_parents_list(info)
 
     if len(args) == 0:
         print("No path given. Check 'gd mkdir -h'.")
@@ -1678,8 +1855,7 @@ def mkdir(args):
 
         [user_name, parent_path, parent_id, drive_name,
             drive_id, client] = info[parent_name]
-        auth_from_cred(gauth, user_name, client)
-        drive = GoogleDrive(gauth)
+        drive = authenticate(user_name, client)
 
         # ---------------DEBUGGING REQ---------------------
         if drive_path.startswith('/'):
@@ -1711,6 +1887,8 @@ def add(args):
     Adds paths to stage for pushing to Google Drive.
     This function just adds the paths to .gdstage file. It doesn't push any file.
     For pushing, use function push() / gd push after adding.
+    The md5 checksums of the staged files are computed (or read from the hash cache, if the files
+    didn't change) and saved in the stage manifest, which 'gd push -u' reads instead of hashing them again.
 
 
     Parameters
@@ -1739,6 +1917,10 @@ def add(args):
     2. add(['-clear'])   /   gd add -clear
         clears all paths in the stage
 
+    3. add(['<path1>', '<path2>', ..., '-j', '<N>'])   /   gd add <path1> <path2> ... -j <N>
+        Use of '-j' : hashes the staged files using <N> processes. '--jobs' can be used in place of '-j'.
+        Small files are hashed in batches, while larger files are hashed by a process each.
+
 
     Examples
     ----------
@@ -1746,6 +1928,8 @@ def add(args):
 
     add(['-clear'])                             / gd add -clear
 
+    add(['<path1>', '-j', '8'])                 / gd add <path1> -j 8
+
     """
 
     if '-h' in args or '-help' in args:
@@ -1761,8 +1945,13 @@ def add(args):
         with open(STAGE_PATH, 'w') as file:
             pass
 
+        save_manifest(STAGE_MANIFEST, {})
         return
 
+    jobs = get_jobs(args)
+
+    staged_files = []
+
     with open(STAGE_PATH, 'a') as file:
 
         for i, path in enumerate(args):
@@ -1779,6 +1968,18 @@ def add(args):
                 file.write(stage_path + '\n')
             else:
                 print(stage_path + " doesnt exist.")
+                continue
+
+            if os.path.isdir(stage_path):
+                for folder_path, _, file_names in os.walk(stage_path):
+                    staged_files += [os.path.join(folder_path, file_name) for file_name in file_names]
+            else:
+                staged_files.append(stage_path)
+
+    # stage manifest : {file path : [size, mtime, inode, md5 checksum]}
+    manifest = load_manifest(STAGE_MANIFEST)
+    manifest.update(hash_manifest(staged_files, jobs=jobs))
+    save_manifest(STAGE_MANIFEST, manifest)
 
 # -----------------------------------------
 
@@ -1819,13 +2020,25 @@ def push(args):
     '-c' :  creates copy
     '-s' :  skip
     '-o' :  overwrites existing file
+    '-u' :  updates existing file only if its size or md5 checksum changed, skips it otherwise
     '-i' :  prompt for each file  (DEFAULT)
 
+    '-j <N>' or '--jobs <N>' : uploads <N> files concurrently, after creating all the drive folders.
+        Prompts can't be shown during concurrent uploads, so existing files are skipped unless '-o', '-c' or '-u' is used.
+        With '-u', the files are first hashed using <N> processes.
+
+    '--chunk-size <MB>' : uploads files in chunks of <MB> megabytes (32 by default).
+        Interrupted uploads are resumed from the last uploaded chunk when pushed again.
+
 
     Examples
     ----------
     push(['-i'])                                     / gd push -i
 
+    push(['-o', '-j', '8'])                          / gd push -o -j 8
+
+    push(['-u'])                                     / gd push -u
+
     push(['<parent_name1>', '-s', '<parent_name2>']) / gd push <parent_name1> -s <parent_name2>
 
     """
@@ -1839,8 +2052,7 @@ def push(args):
         print('gd not initiated in this folder, try : gd init')
         return
 
-    parent_list = list(info.keys())
-    parent_list.remove('default_parent')
+    parent_list = get_parents_list(info)
 
     with open(STAGE_PATH, 'r') as file:
         stage_list = file.readlines()
@@ -1849,6 +2061,9 @@ def push(args):
         print("No staged files. Use 'gd add <paths>' first")
         return
 
+    jobs = get_jobs(args)
+    chunk_size = get_chunk_size(args)
+
     # Default : asks the user
     prompt = 'ask'
 
@@ -1864,10 +2079,19 @@ def push(args):
         args.remove('-c')
         prompt = 'c'  # creates_copy
 
+    if '-u' in args:
+        args.remove('-u')
+        prompt = 'u'  # updates changed files
+
     if '-i' in args:
         args.remove('-i')
         prompt = 'ask'  # asks each time
 
+    # md5s of the staged files hashed by 'gd add', which didn't change since
+    md5s = None
+    if prompt == 'u':
+        md5s = manifest_md5s(load_manifest(STAGE_MANIFEST))
+
     miss_paths = []
 
     if len(args) == 0:
@@ -1876,17 +2100,17 @@ def push(args):
             drive_id, client] = info[parent_name]
 
         print("---------------\n" + parent_name + "\n---------------")
-        auth_from_cred(gauth, user_name, client)
-        drive = GoogleDrive(gauth)
+        drive = authenticate(user_name, client)
 
         for path in stage_list:
             path = path.rstrip()
             if os.path.exists(path):
                 if os.path.isdir(path):
                     upload(path, parent_path, drive,
-                           prompt=prompt, default_root=drive_id)
+                           prompt=prompt, default_root=drive_id, jobs=jobs, chunk_size=chunk_size, md5s=md5s)
                 else:
-                    upload_file_by_id(path, parent_id, drive, prompt=prompt)
+                    upload_file_by_id(path, parent_id, drive,
+                                      prompt=prompt, default_root=drive_id, chunk_size=chunk_size, md5s=md5s)
             else:
                 miss_paths.append(path)
 
@@ -1901,18 +2125,17 @@ def push(args):
                 drive_name, drive_id, client] = info[par]
 
             print("---------------\n" + par + "\n---------------")
-            auth_from_cred(gauth, user_name, client)
-            drive = GoogleDrive(gauth)
+            drive = authenticate(user_name, client)
 
             for path in stage_list:
                 path = path.rstrip()
                 if os.path.exists(path):
                     if os.path.isdir(path):
                         upload(path, parent_path, drive,
-                               prompt=prompt, default_root=drive_id)
+                               prompt=prompt, default_root=drive_id, jobs=jobs, chunk_size=chunk_size, md5s=md5s)
                     else:
                         upload_file_by_id(
-                            path, parent_id, drive, prompt=prompt)
+                            path, parent_id, drive, prompt=prompt, default_root=drive_id, chunk_size=chunk_size, md5s=md5s)
                 else:
                     miss_paths.append(path)
 
@@ -1971,6 +2194,15 @@ def pull(args):
     5. pull(['<parent_name>', '-dest', '<save_path>']) / gd pull <parent_name> -dest <save_path>
         Use of '-dest' : downloads into <save_path> in local system specified from parent_path")
 
+    6. pull(['<parent_name>', '-j', '<N>']) / gd pull <parent_name> -j <N>
+        Use of '-j' : lists <N> drive folders and downloads <N> files concurrently. '--jobs' can be used in place of '-j'.
+        Prompts can't be shown during concurrent downloads, so existing files are skipped unless '-o' or '-c' is used.
+
+    7. pull(['<parent_name>', '--sync']) / gd pull <parent_name> --sync
+        Use of '--sync' : downloads only the files that are new or changed, overwriting the local files.
+        The md5Checksum, fileSize and modifiedDate of each drive file is compared against the local file and
+        the manifest of files pulled before from <parent_name> (saved in the .gd folder).
+
 
     Optional arguements if pulled files already exist on local system -
 
@@ -1979,6 +2211,9 @@ def pull(args):
     '-o' :  overwrites existing file
     '-i' :  prompt for each file (DEFAULT)
 
+    Files are downloaded into '<file_name>.part' files first. If a pull is interrupted,
+    pulling again resumes the .part files from their last byte.
+
 
     Examples
     ----------
@@ -1986,6 +2221,8 @@ def pull(args):
 
     pull(['<parent_name>', '<path1>', <path2>, '-s', '-id', 'id3', '-dest', '<save_path>']) / gd pull <parent_name> <path1> <path2> -s -id <id3> -dest <save_path>
 
+    pull(['<parent_name>', '--sync', '-j', '8']) / gd pull <parent_name> --sync -j 8
+
     """
 
     if '-h' in args or '-help' in args:
@@ -1997,13 +2234,17 @@ def pull(args):
         print('gd not initiated in this folder, try : gd init')
         return
 
-    parent_list = list(info.keys())
-    parent_list.remove('default_parent')
+    parent_list = get_parents_list(info)
     is_id = False  # Checks if path given or id given
+    jobs = get_jobs(args)
 
     # Default : asks the user
     prompt = 'ask'
 
+    sync = '--sync' in args
+    if sync:
+        args.remove('--sync')
+
     if '-s' in args:
         args.remove('-s')
         prompt = 's'  # skips
@@ -2032,8 +2273,7 @@ def pull(args):
 
     [user_name, parent_path, parent_id, drive_name,
         drive_id, client] = info[parent_name]
-    auth_from_cred(gauth, user_name, client)
-    drive = GoogleDrive(gauth)
+    drive = authenticate(user_name, client)
 
     # Initializing drive_path params
     drive_path_list = [parent_path]
@@ -2063,6 +2303,9 @@ def pull(args):
             drive_path_list = args
             drive_path_id_list = [None for i in drive_path_list]
 
+    # manifest of the files synced before
+    manifest = load_manifest('pull_' + parent_name) if sync else None
+
     for drive_path, drive_path_id in zip(drive_path_list, drive_path_id_list):
 
         if not drive_path == None:
@@ -2092,7 +2335,10 @@ def pull(args):
             return
 
         download(drive, drive_path=drive_path, drive_path_id=drive_path_id,
-                 download_path=save_path, prompt=prompt, default_root=drive_id)
+                 download_path=save_path, prompt=prompt, default_root=drive_id, jobs=jobs, manifest=manifest)
+
+    if sync:
+        save_manifest('pull_' + parent_name, manifest)
 
 
 # ------------------------------------------------------------------------------------------------
@@ -2103,9 +2349,222 @@ def help(args):
     print(help_text)
 
 
+def cache(args):
+    """
+    [syntax when imported / syntax when called via CMD]
+
+    Manages the drive paths and ids cached in the .gd folder of the current directory.
+    Cached entries expire after CACHE_TTL seconds (see gdrive2.paths)
+
+
+    Parameters
+    ----------
+    args : list
+        list of arguement strings.
+
+
+    Returns
+    ----------
+    None
+        Deletes the cache files
+
+
+    Notes
+    ----------
+    The following commands go into args :
+
+    0. '-h' / -h  or '-help' / -help : shows help
+
+    1. cache(['clear']) / gd cache clear
+        clears the cache of all the parents, and the md5 checksums of local files
+
+    2. cache(['clear', '<parent_name>']) / gd cache clear <parent_name>
+        clears the cache of the drive of <parent_name>
+
+
+    Examples
+    ----------
+    cache(['clear'])             / gd cache clear
+
+    cache(['clear', 'origin'])   / gd cache clear origin
+
+    """
+
+    if '-h' in args or '-help' in args or len(args) == 0:
+        print(cache.__doc__)
+        return
+
+    info = check_info()
+    if len(info) == 0:
+        print('gd not initiated in this folder, try : gd init')
+        return
+
+    parents_list = get_parents_list(info)
+
+    if args[0] != 'clear' or len(args) > 2:
+        print("Unknown arguements passed. Use 'gd cache -h' for help.")
+        return
+
+    if len(args) == 1:
+        clear_cache()
+        clear_hashes()
+        print("Cache cleared.")
+        return
+
+    parent_name = args[1]
+    if not parent_name in parents_list:
+        print("'" + parent_name + "' : parent name not defined before.")
+        return
+
+    [user_name, _, _, _, drive_id, _] = info[parent_name]
+    clear_cache(drive_id=drive_id, user_name=user_name)
+    print(parent_name + " : cache cleared.")
+
+
+def index(args):
+    """
+    [syntax when imported / syntax when called via CMD]
+
+    Manages the local mirror (index) of drive folders kept in the .gd folder of the current directory.
+    While an index is younger than INDEX_TTL seconds (see gdrive2.paths), listings, finds and
+    path resolutions within the indexed folder are answered from it instead of drive.
+
+    Building an index also saves the parent's page token of the drive changes feed in .gd/.gdinfo.json.
+    Refreshing applies only the changes made after it (new, renamed, moved and trashed files)
+    to the index, instead of listing all the folders again.
+
+
+    Parameters
+    ----------
+    args : list
+        list of arguement strings.
+
+
+    Returns
+    ----------
+    None
+        Edits the index database
+
+
+    Notes
+    ----------
+    The following commands go into args :
+
+    0. '-h' / -h  or '-help' / -help : shows help
+
+    1. index(['build']) / gd index build
+        mirrors the complete folder of the default parent
+
+    2. index(['build', '<parent_name>']) / gd index build <parent_name>
+        mirrors the complete folder of <parent_name>
+
+    3. index(['build', '<parent_name>', '-j', '<N>']) / gd index build <parent_name> -j <N>
+        lists <N> drive folders concurrently while building. '--jobs' can be used in place of '-j'.
+
+    4. index(['refresh']) / gd index refresh
+        applies the changes made in drive since the last build or refresh of the default parent's index
+
+    5. index(['refresh', '<parent_name>']) / gd index refresh <parent_name>
+        applies the changes made in drive to the index of <parent_name>
+
+    6. index(['clear']) / gd index clear
+        deletes the index of all the parents
+
+    7. index(['clear', '<parent_name>']) / gd index clear <parent_name>
+        deletes the index of the drive of <parent_name>
+
+
+    Examples
+    ----------
+    index(['build', 'origin', '-j', '8'])   / gd index build origin -j 8
+
+    index(['refresh', 'origin'])            / gd index refresh origin
+
+    index(['clear'])                        / gd index clear
+
+    """
+
+    if '-h' in args or '-help' in args or len(args) == 0:
+        print(index.__doc__)
+        return
+
+    info = check_info()
+    if len(info) == 0:
+        print('gd not initiated in this folder, try : gd init')
+        return
+
+    parents_list = get_parents_list(info)
+
+    jobs = get_jobs(args)
+
+    if not args[0] in ['build', 'refresh', 'clear'] or len(args) > 2:
+        print("Unknown arguements passed. Use 'gd index -h' for help.")
+        return
+
+    if len(args) == 1 and args[0] == 'clear':
+        clear_index()
+        info[PAGE_TOKENS] = {}
+        with open(INFO_PATH, 'w') as file:
+            json.dump(info, file)
+        print("Index cleared.")
+        return
+
+    if len(args) == 1:
+        parent_name = info['default_parent']
+    else:
+        parent_name = args[1]
+
+    if not parent_name in parents_list:
+        print("'" + parent_name + "' : parent name not defined before.")
+        return
+
+    [user_name, parent_path, parent_id, drive_name,
+        drive_id, client] = info[parent_name]
+
+    page_tokens = info.setdefault(PAGE_TOKENS, {})
+
+    if args[0] == 'clear':
+        set_cache_user(user_name)
+        clear_index(drive_id=drive_id)
+
+        # the index of the drive is shared by all its parents
+        for par in get_parents_list(info):
+            if info[par][0] == user_name and info[par][4] == drive_id:
+                page_tokens.pop(par, None)
+
+        with open(INFO_PATH, 'w') as file:
+            json.dump(info, file)
+        print(parent_name + " : index cleared.")
+        return
+
+    drive = authenticate(user_name, client)
+    start_time = time.time()
+
+    if args[0] == 'refresh':
+        if not parent_name in page_tokens:
+            print(parent_name + " : not indexed. Try : gd index build " + parent_name)
+            return
+
+        count, page_tokens[parent_name] = refresh_index(drive, page_tokens[parent_name], parent_id,
+                                                        default_root=drive_id, jobs=jobs)
+        print(parent_name + " : {} changes applied in {} s.".format(count, round(time.time() - start_time, 2)))
+
+    else:
+        # token is taken before listing, so that changes made while listing are applied by the next refresh
+        page_token = get_start_page_token(drive, default_root=drive_id)
+        records, children = list_tree(drive, parent_id, tier='all', jobs=jobs, default_root=drive_id, use_index=False)
+        count = build_index(drive_id, parent_id, records, children)
+        page_tokens[parent_name] = page_token
+        print(parent_name + " : {} files and folders indexed in {} s.".format(count, round(time.time() - start_time, 2)))
+
+    with open(INFO_PATH, 'w') as file:
+        json.dump(info, file)
+
+
 def default(args):
     """brings the package to its default (if imported, args = [])"""
     shutil.rmtree(CREDS_DIR)
+    _SESSIONS.clear()
 
 
 def version(args):
@@ -2113,6 +2572,131 @@ def version(args):
     print(VERSION)
 
 
+def daemon(args):
+    """
+    [syntax when imported / syntax when called via CMD]
+
+    Manages the gd daemon, which keeps the authenticated drive sessions, http connections and
+    cached metadata of its commands in memory. While it runs, the gd command forwards commands
+    to it over a unix socket, instead of importing gdrive2 and authenticating again.
+    The gd command runs commands itself if the daemon isn't running, or if the
+    environment variable GD_NO_DAEMON is set.
+
+
+    Parameters
+    ----------
+    args : list
+        list of arguement strings.
+
+
+    Returns
+    ----------
+    None
+        Starts or stops the daemon
+
+
+    Notes
+    ----------
+    The following commands go into args :
+
+    0. '-h' / -h  or '-help' / -help : shows help
+
+    1. daemon(['start']) / gd daemon start
+        starts the daemon in the background
+
+    2. daemon(['stop']) / gd daemon stop
+        stops the daemon after its current command
+
+    3. daemon(['status']) / gd daemon status
+        shows whether the daemon is running
+
+    4. daemon(['run']) / gd daemon run
+        runs the daemon in the foreground (used by 'gd daemon start')
+
+    The daemon runs one command at a time and is available only on systems with unix sockets.
+
+
+    Examples
+    ----------
+    daemon(['start'])  / gd daemon start
+
+    daemon(['stop'])   / gd daemon stop
+
+    """
+
+    if '-h' in args or '-help' in args or len(args) != 1:
+        print(daemon.__doc__)
+        return
+
+    if not daemon_supported():
+        print("gd daemon needs unix sockets, which aren't available on this system.")
+        return
+
+    if args[0] == 'start':
+        if daemon_running():
+            print("gd daemon is already running.")
+            return
+
+        import subprocess
+        subprocess.Popen([sys.executable, os.path.join(ROOT_PATH, 'gd.py'), 'daemon', 'run'],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+
+        start_time = time.time()
+        while not daemon_running():
+            if time.time() - start_time > 10*DAEMON_TIMEOUT:
+                print("gd daemon didn't start.")
+                return
+            time.sleep(0.05)
+
+        print("gd daemon started.")
+
+    elif args[0] == 'stop':
+        if stop_daemon():
+            print("gd daemon stopped.")
+        else:
+            print("gd daemon isn't running.")
+
+    elif args[0] == 'status':
+        if daemon_running():
+            print("gd daemon is running : " + daemon_socket_path())
+        else:
+            print("gd daemon isn't running.")
+
+    elif args[0] == 'run':
+        serve(run_command_in)
+
+    else:
+        print("Unknown arguements passed. Use 'gd daemon -h' for help.")
+
+
+def run_command(func, args):
+    """
+    Runs the gd command func with the arguements args and returns the exit status.
+    Errors raised by the command are raised (failed drive requests are already retried, see transport_util).
+    """
+
+    if not func in COMMANDS:
+        print("'" + func + "' : unknown command. Use 'gd help' for the list of commands.")
+        return 1
+
+    globals()[func](args)
+
+    return 0
+
+
+def run_command_in(curr_path, func, args):
+    """Runs the gd command func in the directory curr_path (used by the gd daemon)"""
+
+    os.chdir(curr_path)
+    set_curr_path(curr_path)
+
+    try:
+        return run_command(func, args)
+    finally:
+        save_caches()
+
+
 # -------------------------------------------------------------------------------------------------
 # COMMAND-LINE INTERACTION
 # -------------------------------------------------------------------------------------------------
@@ -2130,22 +2714,13 @@ if __name__ == "__main__":
     # func is the main function
     func = args_func.func
     args = args_func.args
-    args_dup = args.copy()
 
     RETURN_RESULT = False
-    try:
-        exec(func + '(args)')
-    # sometimes token fails to refresh
-    except:
-        exec(func + '(args_dup)')
-    """
-    except errors.HttpError:
-        delete_cred_files()
-        exec( func + '(args)' )
-    
-    except Exception as e:
-        print(e)
-    """
+
+    # commands reach here only if the gd daemon isn't running (see the top of this file)
+    exit_status = run_command(func, args)
+
+    sys.exit(exit_status)
 else:
     # When gd.py is imported
     RETURN_RESULT = True
@@ -0,0 +1,349 @@
+#This file contains functions relevant to the md5 checksums of local files,
+#cached in the .gd folder of the current directory
+
+import os
+import hashlib
+import sqlite3
+import threading
+
+#paths.py contains all the hash cache path information
+if __name__ == 'hash_util':
+    from paths import *
+    import cache_util
+else:
+    from .paths import *
+    from . import cache_util
+
+#Thread local storage for database connections (sqlite connections can't be shared by threads)
+_thread_data = threading.local()
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER, md5 TEXT);
+"""
+
+
+def hash_file_path():
+    """
+    Returns the path to the hash cache database. It is kept in the .gd folder, next to the CACHE_DIR.
+
+    Returns
+    -------------
+    path to the hash cache database : string or None
+        None if no CACHE_DIR is set or if the .gd folder doesn't exist
+    """
+    if cache_util.CACHE_DIR==None or not os.path.exists(os.path.dirname(cache_util.CACHE_DIR)):
+        return None
+
+    return os.path.join(os.path.dirname(cache_util.CACHE_DIR), HASH_FILE)
+
+
+def _connect():
+    """Returns the connection to the hash cache database for the current thread (None if no .gd folder)"""
+    hash_path = hash_file_path()
+
+    if hash_path==None:
+        return None
+
+    if not hasattr(_thread_data, 'connections'):
+        _thread_data.connections = {}
+
+    if not hash_path in _thread_data.connections:
+        connection = sqlite3.connect(hash_path, timeout=30)
+        connection.executescript(_TABLES)
+        _thread_data.connections[hash_path] = connection
+
+    return _thread_data.connections[hash_path]
+
+
+def _stat_key(stat):
+    """Returns the (size, mtime in ns, inode) values identifying the version of a file"""
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def file_md5(file_path, buffer_size=HASH_BUFFER_SIZE):
+    """
+    Returns the md5 checksum of a file on current system. The file is read into one reused buffer.
+
+    Parameters
+    ----------------
+    file_path : string
+        path to the file
+    buffer_size : int (optional)
+        bytes read at a time (HASH_BUFFER_SIZE by default)
+
+    Returns
+    ----------------
+    md5 checksum : string
+        hex digest, as in the 'md5Checksum' of drive files
+    """
+    md5 = hashlib.md5()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    with open(file_path, 'rb', buffering=0) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            md5.update(view[:size])
+
+    return md5.hexdigest()
+
+
+def get_cached_md5(file_path, stat=None):
+    """
+    Returns the cached md5 checksum of a file, if the file didn't change since it was hashed.
+
+    Parameters
+    -------------
+    file_path : string
+    stat : os.stat_result (optional)
+        stat of the file, if already known
+
+    Returns
+    -------------
+    md5 checksum : string or None
+        None if not cached, or if the size, mtime or inode of the file changed
+    """
+    connection = _connect()
+
+    if connection==None:
+        return None
+
+    if stat==None:
+        stat = os.stat(file_path)
+
+    row = connection.execute("SELECT size, mtime, inode, md5 FROM hashes WHERE path = ?",
+                             (os.path.abspath(file_path),)).fetchone()
+
+    if row==None or tuple(row[:3]) != _stat_key(stat):
+        return None
+
+    return row[3]
+
+
+def cache_md5(file_path, md5, stat=None):
+    """
+    Caches the md5 checksum of a file, along with its current size, mtime and inode.
+
+    Parameters
+    -------------
+    file_path : string
+    md5 : string
+    stat : os.stat_result (optional)
+        stat of the file when it was hashed
+
+    Returns
+    -------------
+    None
+    """
+    cache_md5_many([(file_path, md5, stat)])
+
+
+def cache_md5_many(entries):
+    """
+    Caches the md5 checksums of many files in one transaction.
+
+    Parameters
+    -------------
+    entries : list
+        (file_path, md5, stat) tuples. stat can be None to stat the file now.
+
+    Returns
+    -------------
+    None
+    """
+    connection = _connect()
+
+    if connection==None or len(entries)==0:
+        return
+
+    rows = []
+    for file_path, md5, stat in entries:
+        if stat==None:
+            stat = os.stat(file_path)
+        rows.append((os.path.abspath(file_path),) + _stat_key(stat) + (md5,))
+
+    with connection:
+        connection.executemany("INSERT OR REPLACE INTO hashes (path, size, mtime, inode, md5) VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def get_md5(file_path, md5s=None):
+    """
+    Returns the md5 checksum of a file, hashing it only if the cached checksum is missing or stale.
+
+    Parameters
+    -------------
+    file_path : string
+    md5s : dict (optional)
+        checksums already known, like the ones of the stage manifest (see manifest_md5s()) :
+        {absolute file path : md5 checksum}. They are used instead of the hash cache.
+
+    Returns
+    -------------
+    md5 checksum : string
+    """
+    if md5s != None and os.path.abspath(file_path) in md5s:
+        return md5s[os.path.abspath(file_path)]
+
+    stat = os.stat(file_path)
+    md5 = get_cached_md5(file_path, stat)
+
+    if md5==None:
+        md5 = file_md5(file_path)
+        cache_md5(file_path, md5, stat)
+
+    return md5
+
+
+def _hash_batch(file_paths):
+    """Returns the md5 checksums of a batch of files (run by the processes of get_md5_many())"""
+    return [file_md5(file_path) for file_path in file_paths]
+
+
+def _make_batches(file_paths, sizes, batch_size=HASH_BATCH_SIZE):
+    """
+    Groups files into batches of about batch_size bytes. Files larger than batch_size get a batch each,
+    since the md5 of a file can't be computed in parts.
+    """
+    batches = []
+    batch = []
+    batch_bytes = 0
+
+    for file_path, size in zip(file_paths, sizes):
+        if size >= batch_size:
+            batches.append([file_path])
+            continue
+
+        batch.append(file_path)
+        batch_bytes += size
+
+        if batch_bytes >= batch_size:
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+
+    if len(batch) > 0:
+        batches.append(batch)
+
+    return batches
+
+
+def get_md5_many(file_paths, jobs=1):
+    """
+    Returns the md5 checksums of many files, hashing only the files whose cached checksums are missing or stale.
+
+    Parameters
+    -------------
+    file_paths : list
+    jobs : int (optional)
+        number of processes hashing the files. The files are grouped into batches of about HASH_BATCH_SIZE bytes,
+        and larger files are hashed by a process each.
+
+    Returns
+    -------------
+    md5s : dict
+        {file_path : md5 checksum}
+    """
+    md5s = {}
+    stale_paths = []
+    stats = []
+
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        md5 = get_cached_md5(file_path, stat)
+
+        if md5==None:
+            stale_paths.append(file_path)
+            stats.append(stat)
+        else:
+            md5s[file_path] = md5
+
+    batches = _make_batches(stale_paths, [stat.st_size for stat in stats])
+
+    if jobs > 1 and len(batches) > 1:
+        #imported here, since multiprocessing is slow to import and most commands don't hash
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(batches))) as executor:
+                for batch, result in zip(batches, executor.map(_hash_batch, batches)):
+                    md5s.update(zip(batch, result))
+        except BrokenProcessPool:
+            #the processes couldn't start, like when spawned processes can't import the main module
+            #again : the files not hashed yet are hashed in this process
+            pass
+
+    md5s.update([(file_path, file_md5(file_path)) for file_path in stale_paths if not file_path in md5s])
+
+    cache_md5_many([(file_path, md5s[file_path], stat) for file_path, stat in zip(stale_paths, stats)])
+
+    return md5s
+
+
+def hash_manifest(file_paths, jobs=1):
+    """
+    Returns the manifest entries of files, like the staged files of 'gd add' : their sizes, mtimes,
+    inodes and md5 checksums. The files are hashed with get_md5_many(), so unchanged files aren't hashed again.
+
+    Parameters
+    -------------
+    file_paths : list
+    jobs : int (optional)
+        number of processes hashing the files (see get_md5_many())
+
+    Returns
+    -------------
+    manifest entries : dict
+        {absolute file path : [size, mtime in ns, inode, md5 checksum]}
+    """
+    md5s = get_md5_many(file_paths, jobs=jobs)
+
+    return dict([(os.path.abspath(file_path), list(_stat_key(os.stat(file_path))) + [md5]) for file_path, md5 in md5s.items()])
+
+
+def manifest_md5s(manifest):
+    """
+    Returns the md5 checksums of the files in a manifest (see hash_manifest()) which didn't change since.
+
+    Parameters
+    -------------
+    manifest : dict
+        {absolute file path : [size, mtime in ns, inode, md5 checksum]}
+
+    Returns
+    -------------
+    md5s : dict
+        {absolute file path : md5 checksum}
+    """
+    md5s = {}
+
+    for file_path, entry in manifest.items():
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+
+        if tuple(entry[:3]) == _stat_key(stat):
+            md5s[file_path] = entry[3]
+
+    return md5s
+
+
+def clear_hashes():
+    """
+    Deletes all the cached md5 checksums.
+
+    Returns
+    -------------
+    None
+    """
+    connection = _connect()
+
+    if connection==None:
+        return
+
+    with connection:
+        connection.execute("DELETE FROM hashes")
@@ -0,0 +1,543 @@
+#This file contains functions relevant to the local SQLite mirror (index)
+#of drive folders, kept in the .gd folder of the current directory
+
+import os
+import time
+import sqlite3
+import threading
+
+#paths.py contains all the index path information
+if __name__ == 'index_util':
+    from paths import *
+    import cache_util
+else:
+    from .paths import *
+    from . import cache_util
+
+#Thread local storage for database connections (sqlite connections can't be shared by threads)
+_thread_data = threading.local()
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS indexes (
+    user TEXT, drive_id TEXT, folder_id TEXT, root_id TEXT, built REAL,
+    PRIMARY KEY (user, drive_id, folder_id));
+CREATE TABLE IF NOT EXISTS files (
+    user TEXT, drive_id TEXT, id TEXT, parent_id TEXT, title TEXT, mime_type TEXT,
+    size TEXT, quota TEXT, md5 TEXT, modified TEXT,
+    PRIMARY KEY (user, drive_id, id, parent_id));
+CREATE INDEX IF NOT EXISTS files_by_parent ON files (user, drive_id, parent_id, title);
+"""
+
+#Ids of all the files under the folder with id = ? (including the folder)
+_DESCENDANTS = """
+WITH RECURSIVE tree(id) AS (
+    SELECT ?
+    UNION
+    SELECT files.id FROM files JOIN tree ON files.parent_id = tree.id
+    WHERE files.user = ? AND files.drive_id = ?)
+"""
+
+#Ids of the file with id = ? and all its ancestors
+_ANCESTORS = """
+WITH RECURSIVE tree(id) AS (
+    SELECT ?
+    UNION
+    SELECT files.parent_id FROM files JOIN tree ON files.id = tree.id
+    WHERE files.user = ? AND files.drive_id = ?)
+"""
+
+#record keys : table columns
+_COLUMNS = [('id', 'id'), ('title', 'title'), ('mimeType', 'mime_type'), ('fileSize', 'size'),
+            ('quotaBytesUsed', 'quota'), ('md5Checksum', 'md5'), ('modifiedDate', 'modified')]
+
+
+def index_file_path():
+    """
+    Returns the path to the index database. It is kept in the .gd folder, next to the CACHE_DIR.
+
+    Returns
+    -------------
+    path to the index database : string or None
+        None if no CACHE_DIR is set or if the .gd folder doesn't exist
+    """
+    if cache_util.CACHE_DIR==None or not os.path.exists(os.path.dirname(cache_util.CACHE_DIR)):
+        return None
+
+    return os.path.join(os.path.dirname(cache_util.CACHE_DIR), INDEX_FILE)
+
+
+def _connect():
+    """Returns the connection to the index database for the current thread (None if no .gd folder)"""
+    index_path = index_file_path()
+
+    if index_path==None:
+        return None
+
+    if not hasattr(_thread_data, 'connections'):
+        _thread_data.connections = {}
+
+    if not index_path in _thread_data.connections:
+        connection = sqlite3.connect(index_path, timeout=30)
+        connection.executescript(_TABLES)
+        _thread_data.connections[index_path] = connection
+
+    return _thread_data.connections[index_path]
+
+
+def _key(drive_id):
+    """Returns the (user, drive_id) values identifying the rows of a drive"""
+    return (cache_util.CACHE_USER, drive_id)
+
+
+def _to_record(row, parent_ids):
+    """Converts a files table row (in _COLUMNS order) into a metadata dict like the ones listed by drive"""
+    record = {'parents' : [{'id' : parent_id} for parent_id in parent_ids]}
+
+    for (key, _), value in zip(_COLUMNS, row):
+        if value!=None:
+            record[key] = value
+
+    return record
+
+
+def _insert_rows(connection, drive_id, records):
+    """Inserts (or replaces) the rows of (record, parent id) pairs"""
+    rows = []
+    for record, parent_id in records:
+        rows.append(_key(drive_id) + tuple([record.get(key) for key, _ in _COLUMNS]) + (parent_id,))
+
+    connection.executemany("INSERT OR REPLACE INTO files (user, drive_id, " + ', '.join([column for _, column in _COLUMNS])
+                           + ", parent_id) VALUES (" + ', '.join(['?']*(len(_COLUMNS) + 3)) + ")", rows)
+
+
+def _delete_tree(connection, drive_id, folder_id):
+    """Deletes the rows of a folder and of everything under it"""
+    connection.execute(_DESCENDANTS + "DELETE FROM files WHERE user = ? AND drive_id = ? AND id IN (SELECT id FROM tree)",
+                       (folder_id,) + _key(drive_id) + _key(drive_id))
+
+
+def build_index(drive_id, folder_id, records, children):
+    """
+    Saves the listed tree of a folder into the index, replacing its older entries.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    folder_id : string
+        id of the folder (or its alias, like 'root')
+    records, children : dicts
+        as returned by gdrive2.drive_util.list_tree(), with tier = 'all'
+
+    Returns
+    -------------
+    no. of files and folders saved : int
+    """
+    connection = _connect()
+
+    if connection==None:
+        return 0
+
+    root_id = records[folder_id]['id']
+    rows = [(records[folder_id], parent['id']) for parent in records[folder_id].get('parents', [])]
+
+    if len(rows)==0:
+        #folders like the root of a drive have no parents
+        rows = [(records[folder_id], None)]
+
+    for parent_id in children:
+        if parent_id!=folder_id or folder_id==root_id:
+            rows += [(record, parent_id) for record in children[parent_id]]
+
+    with connection:
+        _delete_tree(connection, drive_id, root_id)
+        _insert_rows(connection, drive_id, rows)
+        connection.execute("INSERT OR REPLACE INTO indexes VALUES (?, ?, ?, ?, ?)", _key(drive_id) + (folder_id, root_id, time.time()))
+
+    return len(rows)
+
+
+def clear_index(drive_id=None):
+    """
+    Deletes the index of a drive for the current username.
+
+    Parameters
+    -------------
+    drive_id : string (optional)
+        id of the drive. If None, the index database is deleted.
+
+    Returns
+    -------------
+    None
+    """
+    connection = _connect()
+
+    if connection==None:
+        return
+
+    if drive_id==None:
+        connection.close()
+        del _thread_data.connections[index_file_path()]
+        os.remove(index_file_path())
+        return
+
+    with connection:
+        connection.execute("DELETE FROM files WHERE user = ? AND drive_id = ?", _key(drive_id))
+        connection.execute("DELETE FROM indexes WHERE user = ? AND drive_id = ?", _key(drive_id))
+
+
+def get_index_root(drive_id, file_id, fresh=True):
+    """
+    Checks if a file or folder is inside a fresh index.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    file_id : string
+        id of the file or folder (or an alias, like 'root', of an indexed folder)
+    fresh : bool (optional)
+        If False, indexes older than INDEX_TTL seconds are also considered
+
+    Returns
+    -------------
+    actual id of the file : string or None
+        None if the file isn't in any index built or refreshed within the last INDEX_TTL seconds
+    """
+    connection = _connect()
+
+    if connection==None:
+        return None
+
+    if fresh:
+        fresh_time = time.time() - INDEX_TTL
+    else:
+        fresh_time = 0
+    alias = connection.execute("SELECT root_id FROM indexes WHERE user = ? AND drive_id = ? AND folder_id = ? AND built > ?",
+                               _key(drive_id) + (file_id, fresh_time)).fetchone()
+    if alias!=None:
+        return alias[0]
+
+    covered = connection.execute(_ANCESTORS + "SELECT 1 FROM indexes WHERE user = ? AND drive_id = ? AND built > ? AND root_id IN (SELECT id FROM tree)",
+                                 (file_id,) + _key(drive_id) + _key(drive_id) + (fresh_time,)).fetchone()
+    if covered==None:
+        return None
+
+    return file_id
+
+
+def get_index_children(drive_id, parent_id, name=None):
+    """
+    Returns the contents of a folder from the index.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    parent_id : string
+        id of the folder
+    name : string (optional)
+        If passed, only the contents with title = name are returned
+
+    Returns
+    -------------
+    contents : list or None
+        metadata dicts of the contents, sorted by title, or None if the folder isn't in a fresh index
+    """
+    parent_id = get_index_root(drive_id, parent_id)
+
+    if parent_id==None:
+        return None
+
+    query = "SELECT " + ', '.join(['f.' + column for _, column in _COLUMNS]) + " FROM files f WHERE f.user = ? AND f.drive_id = ? AND f.parent_id = ?"
+    values = _key(drive_id) + (parent_id,)
+
+    if name!=None:
+        query += " AND f.title = ?"
+        values += (name,)
+
+    rows = _connect().execute(query + " ORDER BY f.title, f.id", values).fetchall()
+
+    return [_to_record(row, [parent_id]) for row in rows]
+
+
+def get_index_ancestor(drive_id, file_id):
+    """
+    Looks for the title and parent id of a file/folder in the index.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    file_id : string
+        id of the file or folder
+
+    Returns
+    -------------
+    title and parent id : tuple or None
+        (title, parent id) or None if not in a fresh index
+    """
+    if get_index_root(drive_id, file_id)==None:
+        return None
+
+    row = _connect().execute("SELECT title, parent_id FROM files WHERE user = ? AND drive_id = ? AND id = ? ORDER BY parent_id",
+                             _key(drive_id) + (file_id,)).fetchone()
+
+    return row
+
+
+def index_tree(drive_id, folder_id, tier='all'):
+    """
+    Returns the tree of a folder from the index, in the same form as gdrive2.drive_util.list_tree()
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    folder_id : string
+        id of the folder or file
+    tier : string or int (optional)
+        as in list_tree()
+
+    Returns
+    -------------
+    (records, children) : tuple or None
+        None if the folder isn't in a fresh index
+    """
+    root_id = get_index_root(drive_id, folder_id)
+
+    if root_id==None:
+        return None
+
+    connection = _connect()
+    columns = ', '.join([column for _, column in _COLUMNS])
+    rows = connection.execute("SELECT " + columns + ", parent_id FROM files WHERE user = ? AND drive_id = ? AND id = ?",
+                              _key(drive_id) + (root_id,)).fetchall()
+
+    if len(rows)==0:
+        return None
+
+    root = _to_record(rows[0][:-1], [row[-1] for row in rows if row[-1]!=None])
+    records = {folder_id : root, root_id : root}
+    children = {}
+
+    if 'folder' in root['mimeType']:
+        tier_folders = [root_id]
+    else:
+        tier_folders = []
+
+    depth = 0
+
+    while len(tier_folders) > 0:
+
+        if tier == 0 or (tier == 'curr' and depth == 1) or (type(tier) == int and depth >= tier):
+            break
+
+        for folder in tier_folders:
+            children[folder] = []
+
+        #sqlite limits the no. of variables in a query
+        for start in range(0, len(tier_folders), 500):
+            batch = tier_folders[start:start+500]
+            rows = connection.execute("SELECT " + columns + ", parent_id FROM files WHERE user = ? AND drive_id = ? AND parent_id IN ("
+                                      + ', '.join(['?']*len(batch)) + ") ORDER BY title, id", _key(drive_id) + tuple(batch)).fetchall()
+
+            for row in rows:
+                children[row[-1]].append(_to_record(row[:-1], [row[-1]]))
+
+        next_folders = []
+        for folder in tier_folders:
+            for record in children[folder]:
+                records[record['id']] = record
+                if 'folder' in record['mimeType'] and not record['id'] in children and not record['id'] in next_folders:
+                    next_folders.append(record['id'])
+
+        tier_folders = next_folders
+        depth += 1
+
+    if root_id in children:
+        children[folder_id] = children[root_id]
+
+    return records, children
+
+
+def index_add(drive_id, parent_id, record):
+    """
+    Adds a new (or updated) file or folder to the index, if its parent folder is indexed.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    parent_id : string
+        id of the parent folder
+    record : dict
+        metadata of the file or folder
+
+    Returns
+    -------------
+    None
+    """
+    parent_id = get_index_root(drive_id, parent_id)
+
+    if parent_id==None:
+        return
+
+    connection = _connect()
+    with connection:
+        _insert_rows(connection, drive_id, [(record, parent_id)])
+
+
+def index_remove(drive_id, file_id):
+    """
+    Removes a deleted file or folder (and everything under it) from the index.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    file_id : string
+        id of the file or folder
+
+    Returns
+    -------------
+    None
+    """
+    connection = _connect()
+
+    if connection==None:
+        return
+
+    with connection:
+        _delete_tree(connection, drive_id, file_id)
+
+
+def apply_changes(drive_id, changes):
+    """
+    Applies the changes listed by the drive changes feed to the index of a drive.
+    Files added to, renamed or moved within indexed folders are updated,
+    and files trashed, deleted or moved out of them are removed.
+
+    The contents of folders moved into indexed folders aren't in the changes : these folders
+    are returned, to be listed and added with index_add_tree().
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    changes : list
+        change dicts with 'fileId', 'deleted' and 'file' (metadata with FIELDS['record'] and 'labels(trashed)')
+
+    Returns
+    -------------
+    no. of changes applied and new folders : tuple
+        (no. of changes applied to the index, ids of the folders which weren't in the index before)
+    """
+    connection = _connect()
+
+    if connection==None:
+        return 0, []
+
+    applied = 0
+    new_folder_ids = []
+    pending = list(changes)
+
+    #files added into folders created later in the feed are applied in the next pass
+    while len(pending) > 0:
+        next_pending = []
+
+        for change in pending:
+            file = change.get('file')
+            in_index = get_index_root(drive_id, change['fileId'], fresh=False)!=None
+
+            if change.get('deleted') or file==None or file.get('labels', {}).get('trashed'):
+                if in_index:
+                    index_remove(drive_id, change['fileId'])
+                    applied += 1
+                continue
+
+            parent_ids = [get_index_root(drive_id, parent['id'], fresh=False) for parent in file.get('parents', [])]
+            parent_ids = [parent_id for parent_id in parent_ids if parent_id!=None]
+
+            if len(parent_ids) > 0:
+                with connection:
+                    #only the rows of the file are replaced, its contents remain under it
+                    connection.execute("DELETE FROM files WHERE user = ? AND drive_id = ? AND id = ?", _key(drive_id) + (file['id'],))
+                    _insert_rows(connection, drive_id, [(file, parent_id) for parent_id in parent_ids])
+                applied += 1
+
+                if not in_index and file.get('mimeType')=='application/vnd.google-apps.folder':
+                    new_folder_ids.append(file['id'])
+
+            else:
+                #its parent may be added by a later change
+                next_pending.append(change)
+
+        if len(next_pending)==len(pending):
+            #the rest are outside the indexed folders : files moved out of them are removed
+            for change in next_pending:
+                is_root = connection.execute("SELECT 1 FROM indexes WHERE user = ? AND drive_id = ? AND root_id = ?",
+                                             _key(drive_id) + (change['fileId'],)).fetchone()!=None
+
+                if not is_root and get_index_root(drive_id, change['fileId'], fresh=False)!=None:
+                    index_remove(drive_id, change['fileId'])
+                    applied += 1
+            break
+
+        pending = next_pending
+
+    return applied, new_folder_ids
+
+
+def index_add_tree(drive_id, children):
+    """
+    Adds the listed contents of folders already in the index, like folders moved into indexed folders.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    children : dict
+        as returned by gdrive2.drive_util.list_tree(), with tier = 'all'
+
+    Returns
+    -------------
+    no. of files and folders added : int
+    """
+    connection = _connect()
+
+    if connection==None:
+        return 0
+
+    rows = [(record, parent_id) for parent_id in children for record in children[parent_id]]
+
+    with connection:
+        _insert_rows(connection, drive_id, rows)
+
+    return len(rows)
+
+
+def mark_index_fresh(drive_id, folder_id):
+    """
+    Marks the index of a folder as fresh, after it is refreshed with the changes since its page token.
+    Other indexes of the drive aren't marked, as their page tokens aren't advanced.
+
+    Parameters
+    -------------
+    drive_id : string
+        id of the drive
+    folder_id : string
+        id of the indexed folder (or its alias, like 'root'), as passed to build_index()
+
+    Returns
+    -------------
+    None
+    """
+    connection = _connect()
+
+    if connection==None:
+        return
+
+    with connection:
+        connection.execute("UPDATE indexes SET built = ? WHERE user = ? AND drive_id = ? AND folder_id = ?",
+                           (time.time(),) + _key(drive_id) + (folder_id,))
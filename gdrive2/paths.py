@@ -14,6 +14,42 @@ API_DATA_FOLDER = 'api_data'
 CRED_MAP = 'creds'
 CLIENT_FOLDER = 'client_secrets'
 
+#Drive metadata cache (stored in the .gd folder of initialized directories)
+CACHE_FOLDER = '.gdcache'
+#Seconds after which a cached entry is considered stale
+CACHE_TTL = 3600
+#Manifests of synced files (stored in the .gd folder of initialized directories)
+MANIFEST_FOLDER = '.gdmanifests'
+#Manifest of the staged files, with their sizes, mtimes, inodes and md5 checksums
+STAGE_MANIFEST = 'stage'
+#Resumable upload sessions (stored in the .gd folder of initialized directories)
+UPLOAD_SESSIONS = '.gdsessions.json'
+#Seconds for which an upload session is resumed (drive discards them after a week)
+UPLOAD_SESSION_TTL = 6*24*3600
+#Local mirror of drive folders (stored in the .gd folder of initialized directories)
+INDEX_FILE = '.gdindex.db'
+#Seconds after which the mirror is not used until it is built or refreshed again
+INDEX_TTL = 3600
+#md5 checksums of local files (stored in the .gd folder of initialized directories)
+HASH_FILE = '.gdhashes.db'
+#Bytes read at a time when hashing local files
+HASH_BUFFER_SIZE = 8*1024*1024
+#Bytes of small files hashed together by a process when hashing with many processes
+HASH_BATCH_SIZE = 64*1024*1024
+#Key in the info file holding the changes page token of each parent : {parent_name : page token}
+PAGE_TOKENS = 'page_tokens'
+
+#Folder of the unix socket of the gd daemon, only accessible by the system user. It is made in
+#$XDG_RUNTIME_DIR if set, else in the home folder (as DAEMON_HOME_DIR)
+DAEMON_DIR = 'gdrive2'
+DAEMON_HOME_DIR = '.gdrive2'
+#Name of the unix socket of the gd daemon
+DAEMON_SOCKET = 'gd.sock'
+#Seconds to wait while connecting to the gd daemon
+DAEMON_TIMEOUT = 1
+#Commands are run in the current process instead of the gd daemon if this environment variable is set
+NO_DAEMON_ENV = 'GD_NO_DAEMON'
+
 #Credentials and util paths
 ROOT_PATH = os.path.dirname(__file__)
 CREDS_DIR = os.path.join(ROOT_PATH, API_DATA_FOLDER)
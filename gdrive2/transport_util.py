@@ -0,0 +1,389 @@
+#This file contains functions relevant to the http connections used for drive requests,
+#and to retrying the drive requests which fail
+
+import json
+import time
+import random
+import threading
+import weakref
+
+#Maximum no. of idle http objects kept for reuse for each GoogleAuth() object
+HTTP_POOL_SIZE = 16
+
+#Maximum no. of retries of a drive request
+MAX_RETRIES = 7
+#Maximum delay (in s) before the first retry. It doubles with each retry, upto BACKOFF_MAX
+BACKOFF_BASE = 1
+BACKOFF_MAX = 64
+#Longest Retry-After (in s) waited for. Requests asked to wait longer fail instead.
+MAX_RETRY_AFTER = 300
+#Retry budget shared by all the threads : each successful request earns RETRY_BUDGET_RATIO retries,
+#upto RETRY_BUDGET retries saved. Requests still failing when the budget is spent aren't retried.
+RETRY_BUDGET = 100
+RETRY_BUDGET_RATIO = 0.2
+#403 reasons given by drive when requests are throttled
+RATE_LIMIT_REASONS = ('userRateLimitExceeded', 'rateLimitExceeded')
+#Statuses of errors worth retrying (besides throttling), as the server may succeed the next time
+TRANSIENT_STATUSES = (408, 500, 502, 503, 504)
+
+#Thread local storage for the http objects in use by each thread
+_thread_data = threading.local()
+
+#Idle http objects, returned by the threads which used them : {GoogleAuth() object : list of http objects}
+_IDLE_HTTP = weakref.WeakKeyDictionary()
+#Locks serializing the token refreshes of each GoogleAuth() object : {GoogleAuth() object : lock}
+_REFRESH_LOCKS = weakref.WeakKeyDictionary()
+#Lock for _IDLE_HTTP and _REFRESH_LOCKS
+_POOL_LOCK = threading.Lock()
+
+#Retries left in the retry budget
+_retry_tokens = RETRY_BUDGET
+#time before which no requests are sent, set when drive throttles a request
+_resume_time = 0
+#Lock for _retry_tokens and _resume_time
+_RETRY_LOCK = threading.Lock()
+
+
+class _Lease:
+    """Held by a thread while it uses an http object. The http object goes back to the pool when the thread ends."""
+
+
+def _release_http(auth, http):
+    """Returns an http object to the idle pool of its GoogleAuth() object, or closes it if the pool is full"""
+    with _POOL_LOCK:
+        idle = _IDLE_HTTP.setdefault(auth, [])
+
+        if len(idle) < HTTP_POOL_SIZE:
+            idle.append(http)
+            return
+
+    close_http(http)
+
+
+def close_http(http):
+    """Closes the open connections of an http object"""
+    for connection in list(getattr(http, 'connections', {}).values()):
+        connection.close()
+
+
+def refresh_token(drive):
+    """
+    Refreshes the access token of the drive's GoogleAuth() object if it expired. All the http objects
+    of a GoogleAuth() object share its credentials, so the token is refreshed once for all of them,
+    even if many threads find it expired together.
+
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object (or any pydrive object with auth)
+
+    Returns
+    -------------
+    None
+    """
+    auth = drive.auth
+
+    if not auth.access_token_expired:
+        return
+
+    with _POOL_LOCK:
+        lock = _REFRESH_LOCKS.setdefault(auth, threading.Lock())
+
+    with lock:
+        #another thread may have refreshed it while waiting for the lock
+        if auth.access_token_expired:
+            auth.Refresh()
+
+
+def get_http(drive):
+    """
+    Returns an authorized http object for the current thread.
+    httplib2 http objects are not thread-safe, so each thread making requests
+    gets its own http object, which is reused for all the requests made by that thread.
+
+    When the thread ends, the http object goes back to a pool (of upto HTTP_POOL_SIZE http objects)
+    and is given to the next thread asking for one, so that its open (keep-alive) connections are
+    reused by the thread pools of later uploads, downloads and listings instead of connecting again.
+
+    Parameters
+    -------------
+    drive : pydrive.GoogleDrive() object (or any pydrive object with auth)
+
+    Returns
+    -------------
+    http : httplib2.Http() object
+
+    """
+    if not hasattr(_thread_data, 'http_dict'):
+        _thread_data.http_dict = {}
+
+    refresh_token(drive)
+
+    #http objects are authorized for a specific GoogleAuth() object
+    auth = drive.auth
+    if not auth in _thread_data.http_dict:
+        with _POOL_LOCK:
+            idle = _IDLE_HTTP.get(auth, [])
+            http = idle.pop() if len(idle) > 0 else None
+
+        if http == None:
+            http = auth.Get_Http_Object()
+
+        lease = _Lease()
+        weakref.finalize(lease, _release_http, auth, http)
+        _thread_data.http_dict[auth] = (lease, http)
+
+    return _thread_data.http_dict[auth][1]
+
+
+def _http_error(error):
+    """Returns the HttpError of an error : the error itself, or the HttpError wrapped in a pydrive ApiRequestError (else None)"""
+    if hasattr(error, 'resp') and hasattr(error, 'content'):
+        return error
+
+    if len(getattr(error, 'args', ())) > 0 and hasattr(error.args[0], 'resp'):
+        return error.args[0]
+
+    return None
+
+
+def _error_reason(error):
+    """Returns the reason of an HttpError, like 'userRateLimitExceeded' (None if drive didn't give one)"""
+    try:
+        content = error.content
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        return json.loads(content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def retry_kind(error):
+    """
+    Classifies an error raised by a drive request.
+
+    Parameters
+    -------------
+    error : Exception
+
+    Returns
+    -------------
+    kind : string or None
+        'throttled' for 429s and 403s with a rate limit reason : drive refused the request, and every
+        thread should slow down.
+
+        'transient' for 5xx errors, timeouts and dropped connections : the request may or may not have
+        been done by drive.
+
+        None for errors which aren't retried, like 404s or 403s for missing permissions.
+    """
+    http_error = _http_error(error)
+
+    if http_error != None:
+        status = int(http_error.resp.status)
+
+        if status == 429 or (status == 403 and _error_reason(http_error) in RATE_LIMIT_REASONS):
+            return 'throttled'
+        if status in TRANSIENT_STATUSES:
+            return 'transient'
+        return None
+
+    #imported here, since httplib2 is imported only when a command makes drive requests
+    from http.client import HTTPException
+    from ssl import SSLError
+    from httplib2 import HttpLib2Error
+
+    if isinstance(error, (ConnectionError, TimeoutError, SSLError, HTTPException, HttpLib2Error)):
+        return 'transient'
+
+    return None
+
+
+def retry_after(error):
+    """Returns the delay (in s) asked for by the Retry-After header of an HttpError (None if not asked)"""
+    http_error = _http_error(error)
+
+    if http_error == None:
+        return None
+
+    try:
+        return float(http_error.resp.get('retry-after'))
+    except (TypeError, ValueError):
+        #missing, or given as a date
+        return None
+
+
+def backoff_delay(retry, min_delay=None):
+    """
+    Returns the delay (in s) before a retry : a random delay upto BACKOFF_BASE*2^retry (full jitter),
+    so that the threads throttled together don't retry together.
+
+    Parameters
+    -------------
+    retry : int
+        no. of retries already made
+    min_delay : float (optional)
+        delay asked for by drive (Retry-After)
+
+    Returns
+    -------------
+    delay : float
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE*2**retry))
+
+    if min_delay != None:
+        delay = max(delay, min_delay)
+
+    return delay
+
+
+def _spend_retry():
+    """Takes a retry from the retry budget. Returns False if the budget is spent."""
+    global _retry_tokens
+
+    with _RETRY_LOCK:
+        if _retry_tokens < 1:
+            return False
+
+        _retry_tokens -= 1
+        return True
+
+
+def earn_retry():
+    """Adds RETRY_BUDGET_RATIO retries to the retry budget, after a successful request"""
+    global _retry_tokens
+
+    with _RETRY_LOCK:
+        _retry_tokens = min(RETRY_BUDGET, _retry_tokens + RETRY_BUDGET_RATIO)
+
+
+def _throttle(delay):
+    """Holds the requests of all the threads for delay seconds, after drive throttled a request"""
+    global _resume_time
+
+    with _RETRY_LOCK:
+        _resume_time = max(_resume_time, time.monotonic() + delay)
+
+
+def wait_throttle():
+    """Waits until the requests held by _throttle() can be sent"""
+    while True:
+        with _RETRY_LOCK:
+            delay = _resume_time - time.monotonic()
+
+        if delay <= 0:
+            return
+
+        time.sleep(delay)
+
+
+def retry_delay(error, retry, idempotent=True):
+    """
+    Decides if a failed drive request is retried, and returns the delay before the retry.
+    A throttled request also holds the requests of the other threads for the delay.
+
+    Parameters
+    -------------
+    error : Exception
+        error raised by the request
+    retry : int
+        no. of retries already made
+    idempotent : bool (optional)
+        If False, the request is retried only if drive refused it (throttled), since repeating a request
+        which may have been done, like creating a folder, can do it twice.
+
+    Returns
+    -------------
+    delay : float or None
+        None if the request isn't retried : the error isn't worth retrying, MAX_RETRIES are made,
+        drive asked to wait longer than MAX_RETRY_AFTER, or the retry budget is spent.
+    """
+    kind = retry_kind(error)
+
+    if kind == None or (kind == 'transient' and not idempotent) or retry >= MAX_RETRIES:
+        return None
+
+    min_delay = retry_after(error)
+
+    if min_delay != None and min_delay > MAX_RETRY_AFTER:
+        return None
+
+    if not _spend_retry():
+        return None
+
+    delay = backoff_delay(retry, min_delay)
+
+    if kind == 'throttled':
+        _throttle(delay)
+
+    return delay
+
+
+def call_with_retry(function, *args, idempotent=True, credit=True, **kwargs):
+    """
+    Calls function(*args, **kwargs), which makes a drive request, retrying it with exponential backoff
+    while it fails with errors worth retrying (see retry_kind() and retry_delay()).
+
+    Throttled requests wait atleast as long as drive asks them to (Retry-After), and hold the requests
+    of the other threads too, so that all the threads slow down together. Requests are retried upto
+    MAX_RETRIES times each, and while the retry budget shared by all the threads lasts.
+
+    Parameters
+    -------------
+    function : function
+        makes the request, like request.execute
+    *args, **kwargs :
+        arguements of function
+    idempotent : bool (optional)
+        False for requests which can't be repeated safely, like inserts (see retry_delay())
+    credit : bool (optional)
+        If False, the success isn't credited to the retry budget, like for batch requests,
+        whose calls are credited one by one
+
+    Returns
+    -------------
+    result of function
+
+    Notes
+    -------------
+    Raises the last error if the request isn't retried again.
+    """
+    retry = 0
+
+    while True:
+        wait_throttle()
+
+        try:
+            result = function(*args, **kwargs)
+
+        except Exception as error:
+            delay = retry_delay(error, retry, idempotent=idempotent)
+
+            if delay == None:
+                raise
+
+            time.sleep(delay)
+            retry += 1
+
+        else:
+            if credit:
+                earn_retry()
+            return result
+
+
+def execute_request(request, http=None, idempotent=True):
+    """
+    Executes a googleapiclient HttpRequest, retrying it as in call_with_retry().
+
+    Parameters
+    -------------
+    request : googleapiclient HttpRequest object, like drive.auth.service.files().get(fileId=...)
+    http : httplib2.Http() object (optional)
+        http object used for the request, like get_http(drive). The request's own http object by default.
+    idempotent : bool (optional)
+        False for requests which can't be repeated safely, like inserts
+
+    Returns
+    -------------
+    response : dict
+    """
+    return call_with_retry(request.execute, http=http, idempotent=idempotent)
@@ -0,0 +1,105 @@
+#Tests of the queries of 'gd find' : parsing, the drive 'q' clause and the compiled matcher
+
+import re
+import shlex
+import fnmatch
+
+import pytest
+
+from gdrive2.drive_util import parse_query, compile_query, compile_matcher
+
+NAMES = ['a.txt', 'b.txt', 'ab.csv', 'abc.csv', 'data_1.csv', 'data_2.csv', 'data_2.txt', 'notes',
+         'or', 'and', 'not', 'Report.PDF', 'report.pdf', 'x y.txt', '.hidden', 'abc', '']
+
+QUERIES = ['*.txt', 'a*', 'not *.txt', '*.csv and data*', '*.csv and not data*', 'not *.csv and not *.txt',
+           '*.txt or *.csv', 'a* or b* or n*', 'data* and *2* or *.pdf', 'not a* or b.txt', 'not not a*',
+           '*.csv and not not abc*', '"x y.txt"', "'x y.txt' or or", 'or or and', 'not', 'data_? and *.csv',
+           '[ab]*.txt', '[!a]*', 'report.*', '*']
+
+
+def fnmatch_query(name, query):
+    """
+    Matches a name with the query as 'gd find' did with fnmatch : the query is split at ' or ', each part
+    is a pattern followed by 'and' <pattern> terms, and patterns after 'not' must not match.
+    """
+    for iquery in re.split(r"\Wor\W", query):
+        words = shlex.split(iquery)
+        matched = True
+        is_not = False
+        expect_pattern = True
+        found = False
+
+        for word in words:
+            if word == 'not' and expect_pattern:
+                is_not = not is_not
+            elif word == 'and' and not expect_pattern:
+                expect_pattern = True
+            elif expect_pattern:
+                matched = matched and fnmatch.fnmatch(name, word) != is_not
+                is_not = False
+                expect_pattern = False
+                found = True
+
+        if found and matched:
+            return True
+
+    return False
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_matcher_like_fnmatch(query):
+    matcher = compile_matcher(parse_query(query))
+
+    for name in NAMES:
+        assert (matcher.match(name) != None) == fnmatch_query(name, query), name
+
+
+def test_parse_query():
+    assert parse_query('*.csv and not data* or b*') == [[(False, '*.csv'), (True, 'data*')], [(False, 'b*')]]
+    assert parse_query('not not a*') == [[(False, 'a*')]]
+    assert parse_query('"x y.txt" or \'a b\'') == [[(False, 'x y.txt')], [(False, 'a b')]]
+    assert parse_query('') == []
+
+
+def test_empty_query_matches_nothing():
+    matcher = compile_matcher(parse_query(''))
+
+    assert [name for name in NAMES if matcher.match(name)] == []
+
+
+def test_matcher_full_names():
+    matcher = compile_matcher(parse_query('a*.txt'))
+
+    assert matcher.match('a.txt') != None
+    assert matcher.match('a.txt.bak') == None
+    assert matcher.match('ba.txt') == None
+
+
+@pytest.mark.parametrize('query, clause', [
+    ('abc*', "(title contains 'abc')"),
+    ('data_* and *.csv', "(title contains 'data')"),
+    ('abc* and not abcd*', "(title contains 'abc')"),
+    ('ab* or data*', "(title contains 'ab') or (title contains 'data')"),
+    ('*.csv', None),
+    ('not abc*', None),
+    ('abc* or *.csv', None),
+    ('', None)])
+def test_compile_query(query, clause):
+    assert compile_query(parse_query(query)) == clause
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_query_clause_keeps_matches(query):
+    #every name matching the query contains the prefixes of its 'q' clause
+    parsed_query = parse_query(query)
+    clause = compile_query(parsed_query)
+
+    if clause == None:
+        return
+
+    matcher = compile_matcher(parsed_query)
+    conjunctions = [re.findall("title contains '([^']*)'", and_clause) for and_clause in clause.split(' or ')]
+
+    for name in NAMES:
+        if matcher.match(name):
+            assert any([all([prefix in name for prefix in prefixes]) for prefixes in conjunctions]), name
@@ -0,0 +1,200 @@
+#Tests of the md5 checksums of local files and their cache, on a temporary .gd folder
+
+import os
+import hashlib
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from gdrive2 import cache_util, hash_util
+
+
+@pytest.fixture(autouse=True)
+def gd_folder(tmp_path):
+    """Keeps the hash cache in a temporary .gd folder"""
+    (tmp_path / '.gd').mkdir()
+    cache_util.set_cache_dir(str(tmp_path / '.gd' / '.gdcache'))
+    yield tmp_path
+    cache_util.set_cache_dir(None)
+
+
+@pytest.fixture
+def hash_count(monkeypatch):
+    """Counts the files hashed in this process"""
+    hashed = []
+    file_md5 = hash_util.file_md5
+
+    def counted_md5(file_path, *args, **kwargs):
+        hashed.append(file_path)
+        return file_md5(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(hash_util, 'file_md5', counted_md5)
+    return hashed
+
+
+def write_file(file_path, data):
+    with open(file_path, 'wb') as file:
+        file.write(data)
+    return hashlib.md5(data).hexdigest()
+
+
+def test_file_md5(gd_folder):
+    file_path = str(gd_folder / 'a.bin')
+    md5 = write_file(file_path, os.urandom(3000))
+
+    assert hash_util.file_md5(file_path, buffer_size=1024) == md5
+
+
+def test_get_md5_cached(gd_folder, hash_count):
+    file_path = str(gd_folder / 'a.txt')
+    md5 = write_file(file_path, b'hello')
+
+    assert hash_util.get_md5(file_path) == md5
+    assert hash_util.get_md5(file_path) == md5
+    assert len(hash_count) == 1
+
+
+def test_size_change(gd_folder, hash_count):
+    file_path = str(gd_folder / 'a.txt')
+    write_file(file_path, b'hello')
+    hash_util.get_md5(file_path)
+
+    md5 = write_file(file_path, b'hello world')
+
+    assert hash_util.get_cached_md5(file_path) == None
+    assert hash_util.get_md5(file_path) == md5
+    assert len(hash_count) == 2
+
+
+def test_mtime_change(gd_folder, hash_count):
+    file_path = str(gd_folder / 'a.txt')
+    write_file(file_path, b'hello')
+    stat = os.stat(file_path)
+    hash_util.get_md5(file_path)
+
+    #same size, with the old mtime restored after writing
+    md5 = write_file(file_path, b'jello')
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert hash_util.get_md5(file_path) != md5
+
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert hash_util.get_md5(file_path) == md5
+    assert len(hash_count) == 2
+
+
+def test_inode_change(gd_folder, hash_count):
+    file_path = str(gd_folder / 'a.txt')
+    write_file(file_path, b'hello')
+    stat = os.stat(file_path)
+    hash_util.get_md5(file_path)
+
+    #replaced by another file with the same size and mtime
+    new_path = str(gd_folder / 'b.txt')
+    md5 = write_file(new_path, b'jello')
+    os.utime(new_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(new_path, file_path)
+
+    if os.stat(file_path).st_ino == stat.st_ino:
+        pytest.skip("the file system reused the inode")
+
+    assert hash_util.get_md5(file_path) == md5
+    assert len(hash_count) == 2
+
+
+def test_no_gd_folder(gd_folder, hash_count):
+    cache_util.set_cache_dir(None)
+    file_path = str(gd_folder / 'a.txt')
+    md5 = write_file(file_path, b'hello')
+
+    assert hash_util.get_md5(file_path) == md5
+    assert hash_util.get_md5(file_path) == md5
+    assert len(hash_count) == 2
+
+
+def test_get_md5_known(gd_folder, hash_count):
+    file_path = str(gd_folder / 'a.txt')
+    write_file(file_path, b'hello')
+
+    assert hash_util.get_md5(file_path, md5s={os.path.abspath(file_path) : 'known'}) == 'known'
+    assert len(hash_count) == 0
+
+
+def test_make_batches():
+    batches = hash_util._make_batches(['a', 'b', 'c', 'd', 'e'], [4, 4, 20, 1, 1], batch_size=8)
+
+    assert batches == [['a', 'b'], ['c'], ['d', 'e']]
+
+
+def make_files(folder, count=4):
+    """Returns the paths and md5 checksums of new files"""
+    md5s = {}
+    for i in range(count):
+        file_path = str(folder / (str(i) + '.bin'))
+        md5s[file_path] = write_file(file_path, os.urandom(100 + i))
+    return md5s
+
+
+def test_get_md5_many(gd_folder, hash_count):
+    md5s = make_files(gd_folder)
+    file_paths = list(md5s)
+
+    assert hash_util.get_md5_many(file_paths[:2]) == dict(list(md5s.items())[:2])
+    #only the files not cached before are hashed
+    assert hash_util.get_md5_many(file_paths) == md5s
+    assert len(hash_count) == 4
+
+
+def test_get_md5_many_pool(gd_folder, monkeypatch):
+    md5s = make_files(gd_folder)
+    #a batch for each file, so that they are hashed by the processes
+    monkeypatch.setattr(hash_util, '_make_batches', lambda file_paths, sizes: [[file_path] for file_path in file_paths])
+
+    assert hash_util.get_md5_many(list(md5s), jobs=2) == md5s
+    for file_path, md5 in md5s.items():
+        assert hash_util.get_cached_md5(file_path) == md5
+
+
+def test_get_md5_many_broken_pool(gd_folder, monkeypatch, hash_count):
+    class BrokenExecutor:
+        """Process pool whose processes can't start"""
+        def __init__(self, max_workers=None):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            return False
+        def map(self, function, *iterables):
+            raise BrokenProcessPool("processes couldn't start")
+
+    md5s = make_files(gd_folder)
+    monkeypatch.setattr(hash_util, '_make_batches', lambda file_paths, sizes: [[file_path] for file_path in file_paths])
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', BrokenExecutor)
+
+    assert hash_util.get_md5_many(list(md5s), jobs=2) == md5s
+    assert sorted(hash_count) == sorted(md5s)
+    for file_path, md5 in md5s.items():
+        assert hash_util.get_cached_md5(file_path) == md5
+
+
+def test_manifest(gd_folder):
+    md5s = make_files(gd_folder, count=3)
+    file_paths = list(md5s)
+
+    manifest = hash_util.hash_manifest(file_paths)
+    assert [entry[3] for entry in manifest.values()] == list(md5s.values())
+
+    write_file(file_paths[0], b'changed')
+    os.remove(file_paths[1])
+
+    assert hash_util.manifest_md5s(manifest) == {os.path.abspath(file_paths[2]) : md5s[file_paths[2]]}
+
+
+def test_clear_hashes(gd_folder):
+    file_path = str(gd_folder / 'a.txt')
+    write_file(file_path, b'hello')
+    hash_util.get_md5(file_path)
+
+    hash_util.clear_hashes()
+
+    assert hash_util.get_cached_md5(file_path) == None
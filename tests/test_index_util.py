@@ -0,0 +1,210 @@
+#Tests of the local SQLite mirror (index) of drive folders, on a temporary .gd folder
+
+import pytest
+
+from gdrive2 import cache_util, index_util
+
+FOLDER = 'application/vnd.google-apps.folder'
+
+
+def make_record(file_id, title, parent_id=None, mime_type='text/plain'):
+    """Returns a metadata dict like the ones listed by drive"""
+    record = {'id' : file_id, 'title' : title, 'mimeType' : mime_type, 'fileSize' : '1',
+              'quotaBytesUsed' : '1', 'md5Checksum' : 'md5_' + file_id, 'modifiedDate' : '2020-01-01T00:00:00.000Z'}
+    record['parents'] = [] if parent_id==None else [{'id' : parent_id}]
+    return record
+
+
+def make_change(record=None, file_id=None, deleted=False, trashed=False):
+    """Returns a change dict like the ones listed by the drive changes feed"""
+    if record!=None:
+        record = dict(record, labels={'trashed' : trashed})
+        file_id = record['id']
+    return {'fileId' : file_id, 'deleted' : deleted, 'file' : record}
+
+
+def make_tree():
+    """
+    Returns the records and children (as listed by list_tree()) of the tree :
+        R (root) / A / a.txt
+                 / A / B / b.txt
+                 / r.txt
+    """
+    root = make_record('R', 'My Drive', mime_type=FOLDER)
+    folder_a = make_record('A', 'A', 'R', FOLDER)
+    folder_b = make_record('B', 'B', 'A', FOLDER)
+    file_a = make_record('a', 'a.txt', 'A')
+    file_b = make_record('b', 'b.txt', 'B')
+    file_r = make_record('r', 'r.txt', 'R')
+
+    records = {'root' : root, 'R' : root, 'A' : folder_a, 'B' : folder_b, 'a' : file_a, 'b' : file_b, 'r' : file_r}
+    children = {'root' : [folder_a, file_r], 'R' : [folder_a, file_r], 'A' : [folder_b, file_a], 'B' : [file_b]}
+
+    return records, children
+
+
+@pytest.fixture(autouse=True)
+def gd_folder(tmp_path):
+    """Keeps the index in a temporary .gd folder"""
+    (tmp_path / '.gd').mkdir()
+    cache_util.set_cache_dir(str(tmp_path / '.gd' / '.gdcache'))
+    cache_util.set_cache_user('tester')
+    yield tmp_path
+    cache_util.set_cache_dir(None)
+    cache_util.set_cache_user(None)
+
+
+@pytest.fixture
+def indexed_root():
+    records, children = make_tree()
+    assert index_util.build_index('root', 'root', records, children) == 6
+
+
+def titles(records):
+    return [record['title'] for record in records]
+
+
+def test_no_gd_folder():
+    cache_util.set_cache_dir(None)
+    records, children = make_tree()
+
+    assert index_util.build_index('root', 'root', records, children) == 0
+    assert index_util.get_index_root('root', 'root') == None
+
+
+def test_build_index(indexed_root):
+    assert index_util.get_index_root('root', 'root') == 'R'
+    assert titles(index_util.get_index_children('root', 'root')) == ['A', 'r.txt']
+    assert titles(index_util.get_index_children('root', 'A')) == ['B', 'a.txt']
+    assert titles(index_util.get_index_children('root', 'A', name='a.txt')) == ['a.txt']
+    assert index_util.get_index_children('root', 'A', name='c.txt') == []
+    assert index_util.get_index_ancestor('root', 'b') == ('b.txt', 'B')
+
+    records, children = index_util.index_tree('root', 'A')
+    assert sorted(records) == ['A', 'B', 'a', 'b']
+    assert titles(children['B']) == ['b.txt']
+    assert records['b']['md5Checksum'] == 'md5_b'
+
+
+def test_index_is_per_user_and_drive(indexed_root):
+    assert index_util.get_index_root('other_drive', 'A') == None
+
+    cache_util.set_cache_user('someone_else')
+    assert index_util.get_index_root('root', 'A') == None
+
+
+def test_build_replaces_old_entries(indexed_root):
+    records, children = make_tree()
+    children['B'] = []
+    del records['b']
+
+    index_util.build_index('root', 'root', records, children)
+
+    assert index_util.get_index_children('root', 'B') == []
+    assert index_util.get_index_ancestor('root', 'b') == None
+
+
+def test_ancestors_of_subfolder_index():
+    #only A is indexed, so files outside it aren't covered
+    records, children = make_tree()
+    index_util.build_index('root', 'A', records, children)
+
+    assert index_util.get_index_root('root', 'A') == 'A'
+    assert index_util.get_index_root('root', 'b') == 'b'
+    assert index_util.get_index_root('root', 'r') == None
+    assert index_util.get_index_root('root', 'R') == None
+
+
+def test_stale_index(indexed_root, monkeypatch):
+    monkeypatch.setattr(index_util, 'INDEX_TTL', -1)
+
+    assert index_util.get_index_root('root', 'b') == None
+    assert index_util.get_index_children('root', 'A') == None
+    assert index_util.get_index_root('root', 'b', fresh=False) == 'b'
+
+    monkeypatch.setattr(index_util, 'INDEX_TTL', 3600)
+    assert index_util.get_index_root('root', 'b') == 'b'
+
+
+def test_mark_index_fresh(indexed_root, monkeypatch):
+    monkeypatch.setattr(index_util.time, 'time', lambda: 0)
+    index_util.mark_index_fresh('root', 'root')
+    monkeypatch.undo()
+
+    assert index_util.get_index_root('root', 'A') == None
+
+
+def test_index_remove_descendants(indexed_root):
+    index_util.index_remove('root', 'A')
+
+    assert titles(index_util.get_index_children('root', 'root')) == ['r.txt']
+    for file_id in ['A', 'B', 'a', 'b']:
+        assert index_util.get_index_ancestor('root', file_id) == None
+
+
+def test_index_add(indexed_root):
+    index_util.index_add('root', 'B', make_record('c', 'c.txt', 'B'))
+    #parents outside the index are ignored
+    index_util.index_add('root', 'X', make_record('x', 'x.txt', 'X'))
+
+    assert titles(index_util.get_index_children('root', 'B')) == ['b.txt', 'c.txt']
+    assert index_util.get_index_ancestor('root', 'x') == None
+
+
+def test_apply_changes(indexed_root):
+    changes = [make_change(make_record('c', 'c.txt', 'B')),
+               make_change(make_record('a', 'renamed.txt', 'A')),
+               make_change(make_record('r', 'r.txt', 'R'), trashed=True),
+               make_change(file_id='b', deleted=True),
+               make_change(make_record('o', 'outside.txt', 'X'))]
+
+    assert index_util.apply_changes('root', changes) == (4, [])
+    assert titles(index_util.get_index_children('root', 'root')) == ['A']
+    assert titles(index_util.get_index_children('root', 'A')) == ['B', 'renamed.txt']
+    assert titles(index_util.get_index_children('root', 'B')) == ['c.txt']
+    assert index_util.get_index_ancestor('root', 'o') == None
+
+
+def test_apply_changes_moved_folders(indexed_root):
+    #B is moved out of the index, while a folder from outside is moved into it
+    changes = [make_change(make_record('B', 'B', 'X', FOLDER)),
+               make_change(make_record('N', 'N', 'A', FOLDER))]
+
+    applied, new_folder_ids = index_util.apply_changes('root', changes)
+
+    assert applied == 2
+    assert new_folder_ids == ['N']
+    assert titles(index_util.get_index_children('root', 'A')) == ['N', 'a.txt']
+    assert index_util.get_index_ancestor('root', 'b') == None
+
+    #the contents of N are listed and added separately
+    assert index_util.index_add_tree('root', {'N' : [make_record('n', 'n.txt', 'N')]}) == 1
+    assert index_util.index_tree('root', 'A')[0]['n']['title'] == 'n.txt'
+
+
+def test_apply_changes_moved_within_index(indexed_root):
+    changes = [make_change(make_record('B', 'B', 'R', FOLDER))]
+
+    assert index_util.apply_changes('root', changes) == (1, [])
+    assert titles(index_util.get_index_children('root', 'root')) == ['A', 'B', 'r.txt']
+    assert titles(index_util.get_index_children('root', 'A')) == ['a.txt']
+    #contents of the moved folder remain under it
+    assert titles(index_util.get_index_children('root', 'B')) == ['b.txt']
+
+
+def test_apply_changes_out_of_order(indexed_root):
+    #the file is listed before the folder created for it
+    changes = [make_change(make_record('d', 'd.txt', 'D')),
+               make_change(make_record('D', 'D', 'A', FOLDER))]
+
+    assert index_util.apply_changes('root', changes) == (2, ['D'])
+    assert titles(index_util.get_index_children('root', 'D')) == ['d.txt']
+
+
+def test_apply_changes_stale_index(indexed_root, monkeypatch):
+    #changes are applied to indexes older than INDEX_TTL, which are refreshed by them
+    monkeypatch.setattr(index_util, 'INDEX_TTL', -1)
+
+    assert index_util.apply_changes('root', [make_change(file_id='a', deleted=True)]) == (1, [])
+    assert index_util.get_index_root('root', 'a', fresh=False) == None
+    assert index_util.get_index_root('root', 'b', fresh=False) == 'b'
@@ -0,0 +1,213 @@
+#Tests of the retries of failed drive requests
+
+import json
+import socket
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from pydrive.files import ApiRequestError
+
+from gdrive2 import transport_util
+
+
+def http_error(status, reason=None, retry_after=None):
+    """Returns an HttpError like the ones raised by drive requests"""
+    headers = {'status' : str(status)}
+    if retry_after != None:
+        headers['retry-after'] = str(retry_after)
+
+    content = b''
+    if reason != None:
+        content = json.dumps({'error' : {'errors' : [{'reason' : reason}]}}).encode()
+
+    return HttpError(httplib2.Response(headers), content)
+
+
+@pytest.fixture(autouse=True)
+def retry_state(monkeypatch):
+    """
+    Starts each test with a full retry budget and no throttling. Sleeping only records the delays
+    and moves the clock forward.
+    """
+    monkeypatch.setattr(transport_util, '_retry_tokens', transport_util.RETRY_BUDGET)
+    monkeypatch.setattr(transport_util, '_resume_time', 0)
+
+    now = [100.0]
+    delays = []
+
+    def sleep(delay):
+        delays.append(delay)
+        #slightly past the delay, as a float clock may not move for tiny delays
+        now[0] += delay + 1e-6
+
+    monkeypatch.setattr(transport_util.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(transport_util.time, 'sleep', sleep)
+    return delays
+
+
+def failing(errors, result='done'):
+    """Returns a function raising the errors one by one, and then returning result"""
+    calls = []
+
+    def function(*args, **kwargs):
+        calls.append((args, kwargs))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    function.calls = calls
+    return function
+
+
+@pytest.mark.parametrize('error, kind', [
+    (http_error(429), 'throttled'),
+    (http_error(403, 'userRateLimitExceeded'), 'throttled'),
+    (http_error(403, 'rateLimitExceeded'), 'throttled'),
+    (http_error(403, 'insufficientFilePermissions'), None),
+    (http_error(403), None),
+    (http_error(500), 'transient'),
+    (http_error(503), 'transient'),
+    (http_error(404), None),
+    (http_error(400), None),
+    (ApiRequestError(http_error(429)), 'throttled'),
+    (ApiRequestError(http_error(404)), None),
+    (ConnectionResetError(), 'transient'),
+    (socket.timeout(), 'transient'),
+    (httplib2.ServerNotFoundError(), 'transient'),
+    (FileNotFoundError(), None),
+    (ValueError(), None)])
+def test_retry_kind(error, kind):
+    assert transport_util.retry_kind(error) == kind
+
+
+def test_retry_after():
+    assert transport_util.retry_after(http_error(429, retry_after=3)) == 3
+    assert transport_util.retry_after(http_error(429)) == None
+    assert transport_util.retry_after(http_error(429, retry_after='Wed, 21 Oct 2015 07:28:00 GMT')) == None
+    assert transport_util.retry_after(ValueError()) == None
+
+
+def test_backoff_delay(monkeypatch):
+    monkeypatch.setattr(transport_util.random, 'uniform', lambda low, high: high)
+
+    assert [transport_util.backoff_delay(retry) for retry in range(9)] == [1, 2, 4, 8, 16, 32, 64, 64, 64]
+    assert transport_util.backoff_delay(0, min_delay=5) == 5
+
+    monkeypatch.setattr(transport_util.random, 'uniform', lambda low, high: low)
+    assert transport_util.backoff_delay(3) == 0
+
+
+def test_retry_after_capped(retry_state):
+    assert transport_util.retry_delay(http_error(429, retry_after=transport_util.MAX_RETRY_AFTER), 0) >= transport_util.MAX_RETRY_AFTER
+
+    function = failing([http_error(429, retry_after=transport_util.MAX_RETRY_AFTER + 1)])
+
+    with pytest.raises(HttpError):
+        transport_util.call_with_retry(function)
+    assert len(function.calls) == 1
+    #no retry budget is spent on requests which aren't retried
+    assert transport_util._retry_tokens == transport_util.RETRY_BUDGET - 1
+
+
+def test_call_with_retry(retry_state):
+    function = failing([http_error(503), ConnectionResetError(), http_error(429, retry_after=2)])
+
+    assert transport_util.call_with_retry(function, 'a', b=1) == 'done'
+    assert function.calls == [(('a',), {'b' : 1})]*4
+    assert len(retry_state) == 3
+    assert retry_state[2] >= 2
+
+
+def test_not_retried(retry_state):
+    function = failing([http_error(404)])
+
+    with pytest.raises(HttpError):
+        transport_util.call_with_retry(function)
+    assert len(function.calls) == 1
+    assert retry_state == []
+
+
+def test_max_retries(monkeypatch):
+    monkeypatch.setattr(transport_util, 'MAX_RETRIES', 3)
+    function = failing([http_error(500)]*10)
+
+    with pytest.raises(HttpError):
+        transport_util.call_with_retry(function)
+    assert len(function.calls) == 4
+
+
+def test_not_idempotent():
+    #transient errors aren't retried, as the request may have been done
+    function = failing([http_error(500)])
+    with pytest.raises(HttpError):
+        transport_util.call_with_retry(function, idempotent=False)
+    assert len(function.calls) == 1
+
+    #throttled requests were refused by drive, so they are retried
+    function = failing([http_error(429)])
+    assert transport_util.call_with_retry(function, idempotent=False) == 'done'
+    assert len(function.calls) == 2
+
+
+def test_throttle_holds_requests(monkeypatch, retry_state):
+    monkeypatch.setattr(transport_util.random, 'uniform', lambda low, high: 0)
+
+    assert transport_util.retry_delay(http_error(429, retry_after=5), 0) == 5
+    assert transport_util._resume_time == 105
+
+    transport_util.wait_throttle()
+    transport_util.wait_throttle()
+    assert retry_state == [5]
+
+    #transient errors don't hold the other requests
+    transport_util.retry_delay(http_error(503), 0)
+    assert transport_util._resume_time == 105
+
+
+def test_budget_spent(monkeypatch):
+    monkeypatch.setattr(transport_util, '_retry_tokens', 2)
+    function = failing([http_error(500)]*5)
+
+    with pytest.raises(HttpError):
+        transport_util.call_with_retry(function)
+    assert len(function.calls) == 3
+    assert transport_util._retry_tokens == 0
+
+    #the budget is earned back by successful requests
+    for _ in range(int(round(1/transport_util.RETRY_BUDGET_RATIO))):
+        transport_util.call_with_retry(failing([]))
+    assert transport_util._retry_tokens == pytest.approx(1)
+
+    function = failing([http_error(500)])
+    assert transport_util.call_with_retry(function) == 'done'
+
+
+def test_budget_earned_upto_limit():
+    transport_util.call_with_retry(failing([]))
+    assert transport_util._retry_tokens == transport_util.RETRY_BUDGET
+
+    transport_util.call_with_retry(failing([http_error(500)]))
+    assert transport_util._retry_tokens == transport_util.RETRY_BUDGET - 1 + transport_util.RETRY_BUDGET_RATIO
+
+
+def test_no_credit():
+    transport_util.call_with_retry(failing([http_error(500)]), credit=False)
+
+    assert transport_util._retry_tokens == transport_util.RETRY_BUDGET - 1
+
+
+def test_execute_request():
+    class Request:
+        def __init__(self):
+            self.https = []
+        def execute(self, http=None):
+            self.https.append(http)
+            if len(self.https) == 1:
+                raise http_error(502)
+            return {'id' : 'x'}
+
+    request = Request()
+
+    assert transport_util.execute_request(request, http='pooled http') == {'id' : 'x'}
+    assert request.https == ['pooled http', 'pooled http']